@@ -0,0 +1,268 @@
+import re
+from bisect import bisect_right
+from collections import Counter, deque
+from functools import lru_cache
+
+# Separator used to glue normalized DB names into one searchable string.
+# It never occurs in normalized ingredient text.
+_SEP = "\x00"
+
+
+# OCR confusions: letters read inside E-numbers, digits read inside words
+E_CODE_RE = re.compile(r"^e\s*-?\s*([0-9oilsz|]{3})([a-z]?)$")
+CODE_FIXES = str.maketrans("oilsz|", "011521")
+WORD_DIGIT_RE = re.compile(r"(?<=[a-z])[015](?=[a-z])")
+WORD_FIXES = {"0": "o", "1": "i", "5": "s"}
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+# Declared quantities ("3000 mg/kg") are not part of a name
+QUANTITY_RE = re.compile(r"\d+(?:\.\d+)?\s*(?:mg/kg|g/kg|%)")
+# parse_ingredients emits each E-number upper-cased ("E211") next to the
+# item's normalized name ("e211", "preservatives e211"), which carries the
+# same code; as in the original scan only the normalized token matches
+CODE_TWIN_RE = re.compile(r"^E\d{3}[a-zA-Z]?$")
+
+
+def squash(text):
+    """Lowercase letters and digits only, so split or glued words compare equal"""
+    return NON_ALNUM_RE.sub("", text.lower())
+
+
+def ocr_repair(token):
+    """Undo common OCR confusions; returns (repaired token, characters changed)"""
+    token = token.lower()
+    match = E_CODE_RE.match(token)
+    if match:
+        digits = match.group(1).translate(CODE_FIXES)
+        return "e" + digits + match.group(2), sum(a != b for a, b in zip(digits, match.group(1)))
+    repaired, changed = WORD_DIGIT_RE.subn(lambda m: WORD_FIXES[m.group()], token)
+    return repaired, changed
+
+
+def levenshtein(a, b, limit):
+    """Edit distance between a and b, or limit + 1 once it must exceed limit.
+
+    Only the diagonal band of width 2 * limit + 1 is computed.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        ca = a[i - 1]
+        best = current[0] if lo == 1 else over
+        for j in range(lo, hi + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != b[j - 1]))
+            current[j] = value if value <= limit else over
+            if value < best:
+                best = value
+        if best > limit:
+            return over
+        previous = current
+    return previous[-1]
+
+
+def _trigrams(text):
+    padded = "  " + text + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """Approximate name lookup: trigram inverted lists, then a bounded edit distance.
+
+    Names and queries are compared squashed (see squash). Similarity is
+    1 - distance / longer length; only candidates sharing enough trigrams
+    to possibly reach the threshold are verified.
+    """
+
+    def __init__(self, names, min_length=4):
+        self.min_length = min_length
+        self.names = [squash(name) for name in names]
+        self.postings = {}
+        for i, name in enumerate(self.names):
+            for gram in _trigrams(name):
+                self.postings.setdefault(gram, []).append(i)
+
+    def best(self, query, threshold, repairs=0):
+        """Return (name id, similarity) of the closest name at or above threshold, or (None, 0.0).
+
+        repairs counts OCR confusions already undone in query; each costs
+        half an edit.
+        """
+        query = squash(query)
+        if len(query) < self.min_length:
+            return None, 0.0
+        grams = _trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        best, best_score = None, 0.0
+        for i, count in shared.most_common():
+            name = self.names[i]
+            longest = max(len(query), len(name))
+            # Most edits allowed to still reach the threshold and beat the best so far
+            limit = int((1 - max(threshold, best_score)) * longest - 0.5 * repairs)
+            # Each edit touches at most 3 trigrams of the query (count filter)
+            if limit < 0 or count < len(grams) - 3 * limit or abs(len(query) - len(name)) > limit:
+                continue
+            distance = levenshtein(query, name, limit)
+            if distance > limit:
+                continue
+            score = 1 - (distance + 0.5 * repairs) / longest
+            if score >= threshold and score > best_score:
+                best, best_score = i, score
+        return best, best_score
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher over a fixed list of patterns"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        # Lowest pattern id ending at each state (following fail links)
+        self.best = [None]
+
+        for pid, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                    self.goto[state][ch] = nxt
+                state = nxt
+            if self.best[state] is None:
+                self.best[state] = pid
+
+        # Breadth-first pass to wire failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                inherited = self.best[self.fail[nxt]]
+                if inherited is not None and (self.best[nxt] is None or inherited < self.best[nxt]):
+                    self.best[nxt] = inherited
+
+    def first_pattern_in(self, text):
+        """Return the lowest pattern id occurring anywhere in text, or None"""
+        goto, fail, best = self.goto, self.fail, self.best
+        state = 0
+        found = best[0]
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            pid = best[state]
+            if pid is not None and (found is None or pid < found):
+                found = pid
+        return found
+
+
+class AdditiveIndex:
+    """Precompiled exact + substring lookup over normalized FSSAI entries.
+
+    Matching semantics mirror the original linear scan: an exact hit on a
+    normalized name or code wins, otherwise the first DB entry (in DB order)
+    whose name contains the ingredient or is contained in it.
+
+    lookup_scored adds OCR-tolerant fuzzy matching for tokens with no exact
+    or substring hit, reporting a confidence below 1.0 for such guesses.
+
+    Lookups are memoized per token (up to memo_size entries). The memo
+    belongs to the index, so rebuilding the index for a new DB drops it.
+    """
+
+    def __init__(self, fssai_db, normalize, memo_size=65536):
+        normalized = {}
+        codes = {}
+        for entry in fssai_db:
+            if isinstance(entry, dict):
+                name = normalize(entry.get('name', ''))
+                code = entry.get('code', '').lower()
+                if name:
+                    normalized[name] = entry
+                if code:
+                    normalized[code] = entry
+                    codes[code] = entry
+            elif isinstance(entry, str):
+                name = normalize(entry)
+                if name:
+                    normalized[name] = {'name': entry}
+
+        self.exact = normalized
+        self.codes = codes
+        self.keys = list(normalized.keys())
+        self.values = list(normalized.values())
+
+        # "ingredient in db_name": one C-level find over all names joined
+        self._haystack = _SEP.join(self.keys)
+        self._starts = []
+        offset = 0
+        for key in self.keys:
+            self._starts.append(offset)
+            offset += len(key) + 1
+
+        # "db_name in ingredient": Aho-Corasick over all names
+        self._automaton = AhoCorasick(self.keys)
+        # Codes are only repaired and matched exactly; "e102" vs "e122" is one edit
+        self._fuzzy = FuzzyIndex([key if key not in codes else "" for key in self.keys])
+        self.lookup = lru_cache(maxsize=memo_size)(self._lookup)
+        self.lookup_scored = lru_cache(maxsize=memo_size)(self._lookup_scored)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _lookup(self, ingredient):
+        """Return the DB entry matching a single parsed ingredient, or None"""
+        entry = self.exact.get(ingredient)
+        if entry is not None:
+            return entry
+
+        candidate = None
+        pos = self._haystack.find(ingredient)
+        if pos >= 0:
+            candidate = bisect_right(self._starts, pos) - 1
+
+        pid = self._automaton.first_pattern_in(ingredient)
+        if pid is not None and (candidate is None or pid < candidate):
+            candidate = pid
+
+        if candidate is None:
+            return None
+        return self.values[candidate]
+
+    def _lookup_scored(self, ingredient, threshold):
+        """Return (entry, confidence): 1.0 for exact/substring hits, (None, 0.0) below threshold"""
+        entry = self.lookup(ingredient)
+        if entry is not None:
+            return entry, 1.0
+        if CODE_TWIN_RE.match(ingredient):
+            return None, 0.0
+        repaired, repairs = ocr_repair(QUANTITY_RE.sub("", ingredient).strip())
+        if E_CODE_RE.match(repaired):
+            entry = self.codes.get(repaired)
+            score = 1 - 0.5 * repairs / len(repaired)
+            return (entry, score) if entry is not None and score >= threshold else (None, 0.0)
+        i, score = self._fuzzy.best(repaired, threshold, repairs)
+        return (self.values[i], score) if i is not None else (None, 0.0)
+
+    def match(self, ingredients):
+        """Match a list of parsed ingredients, keeping only hits"""
+        lookup = self.lookup
+        matches = []
+        for ingredient in ingredients:
+            entry = lookup(ingredient)
+            if entry is not None:
+                matches.append(entry)
+        return matches
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+# Memory budget and near-duplicate matching for cached image analyses
+ANALYSIS_CACHE_MB = float(os.getenv("ANALYSIS_CACHE_MB", 64))
+ANALYSIS_CACHE_PERCEPTUAL = os.getenv("ANALYSIS_CACHE_PERCEPTUAL", "0") == "1"
+PERCEPTUAL_MAX_DISTANCE = int(os.getenv("PERCEPTUAL_MAX_DISTANCE", 4))
+
+
+def content_hash(image_bytes):
+    """Exact cache key: SHA-256 of the encoded image bytes"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes):
+    """64-bit difference hash; near-identical frames differ in only a few bits"""
+    import cv2
+    import numpy as np
+    data = np.frombuffer(image_bytes, np.uint8)
+    # Reduced-size decode: the hash only needs a 9x8 thumbnail
+    gray = cv2.imdecode(data, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        return None
+    thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+class AnalysisCache:
+    """LRU cache of image analysis results keyed by image content.
+
+    Entries are evicted least-recently-used first once their estimated
+    size exceeds max_bytes. With perceptual=True a miss on the exact hash
+    falls back to the closest cached frame within max_distance bits.
+    Thread-safe, and independent of Streamlit.
+    """
+
+    def __init__(self, max_bytes=int(ANALYSIS_CACHE_MB * 1024 * 1024), perceptual=ANALYSIS_CACHE_PERCEPTUAL,
+                 max_distance=PERCEPTUAL_MAX_DISTANCE):
+        self.max_bytes = max_bytes
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "perceptual_hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, image_bytes):
+        """Return the cached result for these image bytes, or None"""
+        key = content_hash(image_bytes)
+        phash = perceptual_hash(image_bytes) if self.perceptual else None
+        return self._get(key, phash)
+
+    def set(self, image_bytes, result):
+        key = content_hash(image_bytes)
+        phash = perceptual_hash(image_bytes) if self.perceptual else None
+        self._set(key, phash, result)
+
+    def get_or_compute(self, image_bytes, compute):
+        """Return the cached result or call compute() and cache its result"""
+        key = content_hash(image_bytes)
+        phash = perceptual_hash(image_bytes) if self.perceptual else None
+        result = self._get(key, phash)
+        if result is None:
+            result = compute()
+            self._set(key, phash, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def hit_rate(self):
+        hits = self.stats["hits"] + self.stats["perceptual_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
+
+    def _get(self, key, phash):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+
+            if phash is not None:
+                best_key, best_distance = None, self.max_distance + 1
+                for other_key, (_, other_hash, _) in self._entries.items():
+                    if other_hash is None:
+                        continue
+                    distance = (phash ^ other_hash).bit_count()
+                    if distance < best_distance:
+                        best_key, best_distance = other_key, distance
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.stats["perceptual_hits"] += 1
+                    return self._entries[best_key][0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def _set(self, key, phash, result):
+        size = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (result, phash, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.stats["evictions"] += 1
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache for callers outside Streamlit"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnalysisCache()
+        return _default_cache
@@ -1,19 +1,40 @@
 import streamlit as st
+import enrichment
 from scoring import evaluate_product
-from input_handler import lookup_product_by_barcode
-from vision_handler import decode_barcode, extract_text_from_image, detect_ingredients_section
-import cv2
-import numpy as np
-from PIL import Image
+from product_resolver import resolve_product
+from analysis_cache import AnalysisCache
+import tracing
 
 st.set_page_config(page_title="🥗 Food Health Analyzer")
 
+
+@st.cache_resource
+def get_analysis_cache():
+    # One cache per server process, shared by every session and rerun
+    return AnalysisCache()
+
+
+def show_label_nutrition(result):
+    """Nutrients read from the label's nutrition table, when no product supplied them"""
+    nutrition = result.get("nutrition")
+    if result["product"] or not nutrition or not nutrition["nutrients"]:
+        return
+    basis = "per 100 g"
+    if nutrition["basis"] == "serving":
+        basis += f", scaled from a {nutrition['serving_size']:g} g serving"
+    st.caption(f"Nutrition facts read from the label ({basis})")
+    st.table([{"nutrient": key, "value": value} for key, value in nutrition["nutrients"].items()])
+
+
 st.title("🥗 Food Health Analyzer")
 st.write("Scan a product barcode or upload a nutrition label to get a health score (0–100).")
 
 method = st.radio("Choose input method:", ["Camera", "Barcode", "Upload Image"])
 
-nutrients, ingredients = {}, ""
+nutrients, ingredients, score = {}, "", None
+
+# Per-run stage timings (only collected when TRACING=1)
+trace = tracing.start_request("app." + method.lower().replace(" ", "_"), root=True)
 
 if method == "Camera":
     img_file = st.camera_input("Take a picture of the product", help="Hold the camera steady and ensure good lighting")
@@ -22,24 +43,26 @@ if method == "Camera":
             try:
                 # Show debug information
                 st.write("📷 Processing image...")
-                image = Image.open(img_file)
+                # Vision stack is only imported on the image paths
+                from pipeline import analyze_image_bytes
+                image_bytes = img_file.getvalue()
                 
-                # Display the image
-                st.image(image, caption="Captured Image", use_column_width=True)
+                # Display the image (the browser decodes it; the pipeline decodes it once)
+                st.image(image_bytes, caption="Captured Image", use_column_width=True)
                 
-                # Try to detect barcode
-                barcodes = decode_barcode(image)
+                # Reruns and repeated captures of the same frame reuse the cached analysis
+                result = analyze_image_bytes(image_bytes, get_analysis_cache())
                 
-                if barcodes:
-                    for barcode in barcodes:
+                if result["barcodes"]:
+                    for barcode in result["barcodes"]:
                         st.success(f"✅ Found {barcode['type']} barcode: {barcode['data']} (using {barcode['method']} processing)")
-                        product = lookup_product_by_barcode(barcode['data'])
-                        if product:
-                            st.subheader(product.get("product_name", "Unknown Product"))
-                            nutrients = product.get("nutrients", {})
-                            ingredients = product.get("ingredients_text", "")
-                        else:
-                            st.warning("Product not found in database")
+                    if result["product"]:
+                        st.subheader(result["product"].get("product_name", "Unknown Product"))
+                    else:
+                        st.warning("Product not found in database")
+                        # OCR ran alongside the lookup, so its text is already here
+                        if result["ingredients"]:
+                            st.text_area("Extracted Text", result["ingredients"], height=200)
                 else:
                     st.warning("No barcode detected. Please try again with these tips:")
                     st.info("""
@@ -51,12 +74,10 @@ if method == "Camera":
                     - Try different angles
                     """)
                     
-                    # Try to extract ingredients as fallback
-                    ingredients = detect_ingredients_section(image)
-                    if not ingredients:
-                        ingredients = extract_text_from_image(img_file)
-                    if ingredients:
-                        st.text_area("Extracted Text", ingredients, height=200)
+                    if result["ingredients"]:
+                        st.text_area("Extracted Text", result["ingredients"], height=200)
+                show_label_nutrition(result)
+                nutrients, ingredients, score = result["nutrients"], result["ingredients"], result["score"]
                     
             except Exception as e:
                 st.error(f"Error processing image: {str(e)}")
@@ -65,7 +86,7 @@ if method == "Camera":
 elif method == "Barcode":
     barcode = st.text_input("Enter Barcode:")
     if barcode:
-        product = lookup_product_by_barcode(barcode)
+        product = resolve_product(barcode)
         if product:
             st.subheader(product.get("product_name", "Unknown Product"))
             nutrients = product.get("nutrients", {})
@@ -77,32 +98,28 @@ elif method == "Upload Image":
     uploaded = st.file_uploader("Upload Image", type=["jpg", "png"])
     if uploaded:
         try:
+            from pipeline import analyze_image_bytes
+            image_bytes = uploaded.getvalue()
+
             # Display uploaded image
-            image = Image.open(uploaded)
-            st.image(image, caption="Uploaded Image", use_column_width=True)
+            st.image(image_bytes, caption="Uploaded Image", use_column_width=True)
             
-            # Try to detect barcode first
-            barcodes = decode_barcode(image)
-            if barcodes:
-                st.success(f"Found barcode: {barcodes[0]['data']}")
-                product = lookup_product_by_barcode(barcodes[0]['data'])
-                if product:
-                    st.subheader(product.get("product_name", "Unknown Product"))
-                    nutrients = product.get("nutrients", {})
-                    ingredients = product.get("ingredients_text", "")
-            else:
-                # Try to extract ingredients
-                with st.spinner("Analyzing image..."):
-                    ingredients = detect_ingredients_section(image)
-                    if not ingredients:
-                        ingredients = extract_text_from_image(uploaded)
-                    st.text_area("Extracted Text", ingredients, height=200)
+            with st.spinner("Analyzing image..."):
+                result = analyze_image_bytes(image_bytes, get_analysis_cache())
+            if result["barcodes"]:
+                st.success(f"Found barcode: {result['barcodes'][0]['data']}")
+                if result["product"]:
+                    st.subheader(result["product"].get("product_name", "Unknown Product"))
+            if not result["product"]:
+                st.text_area("Extracted Text", result["ingredients"], height=200)
+            show_label_nutrition(result)
+            nutrients, ingredients, score = result["nutrients"], result["ingredients"], result["score"]
         except Exception as e:
             st.error(f"Error processing image: {str(e)}")
             st.info("Please try uploading a different image")
 
 if nutrients or ingredients:
-    score, pros, cons, missing = evaluate_product(nutrients, ingredients)
+    score, pros, cons, missing = score or evaluate_product(nutrients, ingredients)
 
     st.metric("Health Score", f"{score}/100")
 
@@ -112,3 +129,14 @@ if nutrients or ingredients:
         st.error("⚠️ Cons\n" + "\n".join([f"- {c}" for c in cons]))
     if missing:
         st.info("🔍 No data found for: " + ", ".join(missing))
+        enrichment.submit(missing)
+        web = enrichment.lookup_many(missing)
+        if web:
+            with st.expander("🌐 From the web"):
+                for ingredient, results in web.items():
+                    st.markdown(f"**{ingredient}**: " + " · ".join(
+                        f"[{result['title']}]({result['link']})" for result in results))
+
+if tracing.finish_request(trace) and trace.spans:
+    with st.expander(f"⏱️ Stage timings ({trace.seconds * 1000:.0f} ms)"):
+        st.table([{"stage": "  " * row["depth"] + row["stage"], "ms": row["ms"]} for row in trace.rows()])
@@ -0,0 +1,349 @@
+"""Background web enrichment for ingredients the reference data does not know.
+
+evaluate_product reports unmatched ingredients in `missing`; the app and the
+batch pipeline hand them to submit(), which only enqueues them, so neither
+waits on the network. A daemon thread drains the queue in batches:
+
+- tokens are deduplicated in-process (queued or already seen) and against
+  the shared cache, so each unknown ingredient is searched once per TTL by
+  every process that shares ENRICHMENT_CACHE_PATH;
+- searches run on a small thread pool, each taking a token from a
+  per-process bucket (ENRICHMENT_RATE per second, bursts of
+  ENRICHMENT_BURST) and from the daily search quota
+  (ENRICHMENT_DAILY_QUOTA per UTC day), which is counted in the cache file
+  and so shared by every process using it;
+- quota and server errors are not cached; the token is forgotten and
+  searched again the next time it comes up.
+
+lookup() and lookup_many() read the results back from the cache only.
+The stage is opt-in: ENRICHMENT=1 runs it, provided a search API key is
+configured or GOOGLE_SEARCH_URL points at a (stub) server.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import tracing
+from lookup_cache import BARCODE_CACHE_PATH, MISS, open_lookup_cache
+
+ENRICHMENT = os.getenv("ENRICHMENT", "0")
+ENRICHMENT_CACHE_PATH = os.getenv("ENRICHMENT_CACHE_PATH", BARCODE_CACHE_PATH)
+ENRICHMENT_TTL = float(os.getenv("ENRICHMENT_TTL", 30 * 24 * 3600))
+ENRICHMENT_NEGATIVE_TTL = float(os.getenv("ENRICHMENT_NEGATIVE_TTL", 7 * 24 * 3600))
+ENRICHMENT_RATE = float(os.getenv("ENRICHMENT_RATE", 1))
+ENRICHMENT_BURST = int(os.getenv("ENRICHMENT_BURST", 5))
+# Free tier of the Custom Search JSON API
+ENRICHMENT_DAILY_QUOTA = int(os.getenv("ENRICHMENT_DAILY_QUOTA", 100))
+ENRICHMENT_BATCH = int(os.getenv("ENRICHMENT_BATCH", 10))
+ENRICHMENT_BATCH_WAIT = float(os.getenv("ENRICHMENT_BATCH_WAIT", 1))
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", 4))
+ENRICHMENT_QUEUE_SIZE = int(os.getenv("ENRICHMENT_QUEUE_SIZE", 1000))
+
+SEARCH_RESULTS = 2
+# OCR garbage and whole unsplit paragraphs are not worth a search
+MAX_TOKEN_LENGTH = 60
+
+
+def ingredient_key(ingredient):
+    """Cache key for a `missing` token, which scoring has already normalized.
+
+    Only case and whitespace are folded: normalize_ingredient is not
+    idempotent, so normalizing again would drift ("emulsifiers" -> "emulsifierss").
+    """
+    return " ".join(ingredient.lower().split())
+
+
+def search_query(key):
+    return f"{key} food ingredient"
+
+
+def compact(items):
+    """Keep the fields worth showing from search result items"""
+    return [{"title": item.get("title", ""), "link": item.get("link", ""), "snippet": item.get("snippet", "")}
+            for item in items[:SEARCH_RESULTS]]
+
+
+class TokenBucket:
+    """capacity tokens, refilled continuously at rate per second"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token: returns 0 on success, else the seconds until one is available"""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class DailyQuota:
+    """At most quota acquisitions per UTC day, counted in an SQLite file.
+
+    Every process pointing at the same path shares the count. The file is
+    opened on first use; pass path=None (or an unusable path) to count in
+    memory, i.e. per process.
+    """
+
+    def __init__(self, quota, path=None, table="enrichment_quota", clock=time.time):
+        self.quota = quota
+        self.path = path
+        self.table = table
+        self.clock = clock
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = None
+        if self.path:
+            try:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5)
+                conn.execute("PRAGMA journal_mode=WAL")
+            except (OSError, sqlite3.Error):
+                # e.g. a read-only home directory: fall back to a per-process count
+                conn = None
+        if conn is None:
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (day TEXT PRIMARY KEY, used INTEGER)")
+        return conn
+
+    def try_acquire(self):
+        """Count one search: returns 0 on success, else the seconds until the next UTC day"""
+        now = datetime.fromtimestamp(self.clock(), timezone.utc)
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            with self._conn:
+                # Atomic across processes: the update only applies while under quota
+                acquired = self._conn.execute(
+                    f"INSERT INTO {self.table} VALUES (?, 1) "
+                    "ON CONFLICT(day) DO UPDATE SET used = used + 1 WHERE used < ?",
+                    (now.date().isoformat(), self.quota),
+                ).rowcount
+        if acquired:
+            return 0.0
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+        return (tomorrow - now).total_seconds()
+
+
+class Enricher:
+    """Deduplicating, rate-limited background resolver for unmatched ingredients.
+
+    search(query, num_results) returns result items (web_fallback.google_search
+    by default, loaded in the worker thread) and may raise to mean "try later".
+    """
+
+    def __init__(self, search=None, cache=None, rate=ENRICHMENT_RATE, burst=ENRICHMENT_BURST,
+                 daily_quota=ENRICHMENT_DAILY_QUOTA, quota_path=ENRICHMENT_CACHE_PATH, batch_size=ENRICHMENT_BATCH,
+                 batch_wait=ENRICHMENT_BATCH_WAIT, workers=ENRICHMENT_WORKERS,
+                 queue_size=ENRICHMENT_QUEUE_SIZE):
+        self.search = search
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.workers = workers
+        self.buckets = [TokenBucket(rate, burst), DailyQuota(daily_quota, quota_path)]
+        self.disabled = False
+        self.stats = {"submitted": 0, "duplicates": 0, "dropped": 0, "cached": 0, "searches": 0, "errors": 0}
+        self._cache = cache
+        self._queue = queue.Queue(queue_size)
+        self._seen = OrderedDict()
+        self._max_seen = 10 * queue_size
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = open_lookup_cache(
+                        "enrichment", ENRICHMENT_CACHE_PATH, ENRICHMENT_TTL, ENRICHMENT_NEGATIVE_TTL, 4096
+                    )
+        return self._cache
+
+    def submit(self, ingredients):
+        """Queue unmatched ingredients for a web lookup; never blocks"""
+        if self.disabled:
+            return
+        for ingredient in ingredients:
+            key = ingredient_key(ingredient)
+            if not key or len(key) > MAX_TOKEN_LENGTH:
+                continue
+            with self._lock:
+                duplicate = key in self._seen
+                if duplicate:
+                    self.stats["duplicates"] += 1
+                else:
+                    self._seen[key] = True
+                    if len(self._seen) > self._max_seen:
+                        self._seen.popitem(last=False)
+            if duplicate:
+                continue
+            try:
+                self._queue.put_nowait(key)
+                self._count("submitted")
+            except queue.Full:
+                self._forget(key)
+                self._count("dropped")
+        self._ensure_started()
+
+    def lookup(self, ingredient):
+        """Cached search results for an ingredient: a list, or None if unknown or not yet searched"""
+        value = self.cache.get(ingredient_key(ingredient))
+        return None if value is MISS else value
+
+    def lookup_many(self, ingredients):
+        """{ingredient: results} for the ingredients that have results"""
+        found = {}
+        for ingredient in ingredients:
+            results = self.lookup(ingredient)
+            if results:
+                found[ingredient] = results
+        return found
+
+    def join(self, timeout=None):
+        """Wait until every queued ingredient has been handled; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        tracing.count("enrichment_" + name)
+
+    def _forget(self, key):
+        with self._lock:
+            self._seen.pop(key, None)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="enrichment", daemon=True)
+                    self._thread.start()
+
+    def _default_search(self):
+        import web_fallback
+        if not web_fallback.search_configured():
+            return None
+        return web_fallback.google_search
+
+    def _run(self):
+        from concurrent.futures import ThreadPoolExecutor, wait
+        search = self.search or self._default_search()
+        if search is None:
+            # Nothing to search with: stop collecting and discard what is queued
+            self.disabled = True
+            while self._next_batch():
+                pass
+            return
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enrichment") as pool:
+            while not self._stop.is_set():
+                batch = self._next_batch()
+                futures = []
+                for key in batch:
+                    # Another process may have resolved it since it was queued
+                    if self.cache.get(key) is not MISS:
+                        self._count("cached")
+                        self._queue.task_done()
+                    elif self._acquire():
+                        futures.append(pool.submit(self._resolve, search, key))
+                    else:
+                        self._queue.task_done()
+                wait(futures)
+
+    def _next_batch(self):
+        """Up to batch_size keys, waiting at most batch_wait after the first"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self.disabled:
+            for _ in batch:
+                self._queue.task_done()
+        return batch
+
+    def _acquire(self):
+        """Take one search from every bucket, sleeping as needed; False if closed meanwhile"""
+        for bucket in self.buckets:
+            wait_seconds = bucket.try_acquire()
+            while wait_seconds:
+                if self._stop.wait(wait_seconds):
+                    return False
+                wait_seconds = bucket.try_acquire()
+        return True
+
+    def _resolve(self, search, key):
+        try:
+            with tracing.span("enrichment.search"):
+                items = search(search_query(key), SEARCH_RESULTS)
+        except Exception:
+            # Quota, timeout or server error: not cached, searched again when next seen
+            self._forget(key)
+            self._count("errors")
+        else:
+            self.cache.set(key, compact(items) or None)
+            self._count("searches")
+        finally:
+            self._queue.task_done()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_enricher():
+    """The process-wide Enricher, or None unless ENRICHMENT=1"""
+    global _default
+    if _default is None and ENRICHMENT == "1":
+        with _default_lock:
+            if _default is None:
+                _default = Enricher()
+    return _default
+
+
+def submit(ingredients):
+    enricher = get_enricher()
+    if enricher is not None:
+        enricher.submit(ingredients)
+
+
+def lookup_many(ingredients):
+    enricher = get_enricher()
+    if enricher is None or enricher.disabled or not ingredients:
+        return {}
+    return enricher.lookup_many(ingredients)
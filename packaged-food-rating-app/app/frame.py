@@ -0,0 +1,107 @@
+import io
+import os
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+from tracing import traced
+
+# Large uploads are decoded at the smallest 1/2, 1/4 or 1/8 scale that stays at
+# least this wide (JPEG decodes fewer pixels; other formats are shrunk after decoding)
+FRAME_DECODE_WIDTH = int(os.getenv("FRAME_DECODE_WIDTH", 2000))
+
+REDUCED_FLAGS = {8: cv2.IMREAD_REDUCED_COLOR_8, 4: cv2.IMREAD_REDUCED_COLOR_4, 2: cv2.IMREAD_REDUCED_COLOR_2}
+
+
+class Frame:
+    """One decoded image shared by every vision function.
+
+    The BGR array is decoded once; the grayscale image and downscaled
+    grayscale levels (the pyramid, keyed by width) are computed on first
+    use and cached. Accessors return the cached arrays themselves, and
+    crops of them are views, so callers must not modify them in place.
+    Thread-safe: concurrent stages may add levels while others read them.
+    """
+
+    def __init__(self, bgr=None, gray=None):
+        if bgr is None and gray is None:
+            raise ValueError("Frame needs a BGR or grayscale array")
+        self._bgr = bgr
+        self._gray = gray
+        self.pyramid = {}
+        # Guards the lazily built arrays; reentrant because gray derives from bgr
+        self._lock = threading.RLock()
+
+    @classmethod
+    @traced("vision.frame_decode")
+    def from_bytes(cls, data, max_width=FRAME_DECODE_WIDTH):
+        """Decode encoded image bytes, at reduced resolution when far larger than max_width"""
+        try:
+            # Reads only the header, not the pixels
+            width = Image.open(io.BytesIO(data)).size[0]
+        except Exception:
+            width = 0
+        factor = next((f for f in REDUCED_FLAGS if max_width and width / f >= max_width), 1)
+        buffer = np.frombuffer(data, np.uint8)
+        bgr = cv2.imdecode(buffer, REDUCED_FLAGS[factor] if factor > 1 else cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError("Could not decode image")
+        return cls(bgr)
+
+    @property
+    def bgr(self):
+        if self._bgr is None:
+            with self._lock:
+                if self._bgr is None:
+                    self._bgr = cv2.cvtColor(self._gray, cv2.COLOR_GRAY2BGR)
+        return self._bgr
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            with self._lock:
+                if self._gray is None:
+                    self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def gray_at_width(self, width):
+        """Grayscale resized to width (aspect kept), cached per width.
+
+        Downscales start from the smallest cached level that is still
+        wide enough, so e.g. a 500 px level is derived from the 1000 px one.
+        """
+        gray = self.gray
+        if width == gray.shape[1]:
+            return gray
+        level = self.pyramid.get(width)
+        if level is not None:
+            return level
+        with self._lock:
+            level = self.pyramid.get(width)
+            if level is None:
+                wider = [w for w in self.pyramid if w > width]
+                source = self.pyramid[min(wider)] if wider else gray
+                height = int(gray.shape[0] * width / gray.shape[1])
+                interpolation = cv2.INTER_AREA if width < source.shape[1] else cv2.INTER_LINEAR
+                level = cv2.resize(source, (width, height), interpolation=interpolation)
+                self.pyramid[width] = level
+        return level
+
+
+def as_frame(image):
+    """Wrap a Frame, encoded bytes, file-like upload, PIL image or BGR/gray array"""
+    if isinstance(image, Frame):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Frame.from_bytes(bytes(image))
+    if hasattr(image, "getvalue"):
+        return Frame.from_bytes(image.getvalue())
+    if isinstance(image, Image.Image):
+        if image.mode == "L":
+            return Frame(gray=np.asarray(image))
+        return Frame(cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR))
+    if isinstance(image, np.ndarray):
+        return Frame(gray=image) if image.ndim == 2 else Frame(image)
+    if hasattr(image, "read"):
+        return Frame.from_bytes(image.read())
+    raise TypeError(f"Unsupported image type: {type(image).__name__}")
@@ -1,25 +1,94 @@
+import os
+import threading
 import requests
-from PIL import Image
-import pytesseract
+from requests.adapters import HTTPAdapter
+from lookup_cache import MISS, open_lookup_cache
+from off_mirror import get_default_mirror
+import tracing
+from tracing import traced
 
+# OpenFoodFacts endpoint and timeout (override OFF_API_URL to point at a stub server)
+OFF_API_URL = os.getenv("OFF_API_URL", "https://world.openfoodfacts.org")
+LOOKUP_TIMEOUT = float(os.getenv("LOOKUP_TIMEOUT", "5"))
+
+# Barcode cache (BARCODE_CACHE_* settings in lookup_cache), opened on first lookup
+_barcode_cache = None
+_barcode_cache_lock = threading.Lock()
+
+def get_barcode_cache():
+    """The barcode lookup cache, opened on first use rather than at import"""
+    global _barcode_cache
+    if _barcode_cache is None:
+        with _barcode_cache_lock:
+            if _barcode_cache is None:
+                _barcode_cache = open_lookup_cache("barcodes")
+    return _barcode_cache
+
+# Shared, pooled session keeps connections alive between lookups and threads
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16))
+session.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
+@traced("lookup.extract_text")
 def extract_text_from_image(image_file):
     """Extract text from uploaded nutrition label image"""
+    # Imaging/OCR stack is only loaded by callers that OCR
+    from PIL import Image
+    import ocr_backend
     img = Image.open(image_file)
-    text = pytesseract.image_to_string(img)
+    text = ocr_backend.image_to_string(img)
     return text.strip()
 
-def lookup_product_by_barcode(barcode: str):
-    """Fetch product data from OpenFoodFacts"""
-    url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
-    response = requests.get(url)
+@traced("lookup.openfoodfacts")
+def fetch_product_from_openfoodfacts(barcode: str):
+    """Fetch product data from OpenFoodFacts, bypassing the cache.
+
+    Returns (found, product): found is False for a definite miss
+    (status 0), None when the request failed and should not be cached.
+    """
+    url = f"{OFF_API_URL}/api/v0/product/{barcode}.json"
+    response = session.get(url, timeout=LOOKUP_TIMEOUT)
     if response.status_code != 200:
-        return None
+        return None, None
     data = response.json()
     if data.get('status') == 0:
-        return None
-    
-    return {
+        return False, None
+
+    return True, {
         "product_name": data['product'].get('product_name', ''),
         "ingredients_text": data['product'].get('ingredients_text', ''),
         "nutrients": data['product'].get('nutriments', {})
     }
+
+@traced("lookup.barcode")
+def lookup_barcode(barcode: str, use_cache=True):
+    """Look a barcode up in the local OFF mirror, the cache, then OpenFoodFacts.
+
+    Returns (found, product) like fetch_product_from_openfoodfacts: found is
+    None when OpenFoodFacts could not answer.
+    """
+    mirror = get_default_mirror()
+    if mirror is not None:
+        product = mirror.get(barcode)
+        if product is not None:
+            tracing.count("mirror_hits")
+            return True, product
+        tracing.count("mirror_misses")
+
+    barcode_cache = get_barcode_cache() if use_cache else None
+    if use_cache:
+        cached = barcode_cache.get(barcode)
+        if cached is not MISS:
+            tracing.count("barcode_cache_hits")
+            return cached is not None, cached
+        tracing.count("barcode_cache_misses")
+
+    found, product = fetch_product_from_openfoodfacts(barcode)
+    if use_cache and found is not None:
+        # Misses are cached too, with the shorter negative TTL
+        barcode_cache.set(barcode, product)
+    return found, product
+
+def lookup_product_by_barcode(barcode: str, use_cache=True):
+    """Fetch product data from the local OFF mirror, falling back to OpenFoodFacts"""
+    return lookup_barcode(barcode, use_cache)[1]
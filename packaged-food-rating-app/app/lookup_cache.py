@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# Returned by LookupCache.get when a key is absent or expired
+MISS = object()
+
+# Shared by the barcode, resolver and enrichment caches and the OFF mirror
+CACHE_DIR = Path.home() / ".cache" / "food-health-analyzer"
+# Set BARCODE_CACHE_PATH to an empty string for memory-only caching
+BARCODE_CACHE_PATH = os.getenv("BARCODE_CACHE_PATH", str(CACHE_DIR / "lookups.sqlite"))
+BARCODE_CACHE_TTL = float(os.getenv("BARCODE_CACHE_TTL", 7 * 24 * 3600))
+BARCODE_NEGATIVE_TTL = float(os.getenv("BARCODE_NEGATIVE_TTL", 3600))
+BARCODE_CACHE_SIZE = int(os.getenv("BARCODE_CACHE_SIZE", 1024))
+
+
+class LookupCache:
+    """Two-level TTL cache: an in-process LRU in front of an SQLite store.
+
+    Values must be JSON-serializable. Storing None records a negative
+    result (e.g. "product not found"), which expires after negative_ttl.
+    Pass path=None to keep the cache in memory only.
+    """
+
+    def __init__(self, path=None, table="lookups", ttl=7 * 24 * 3600, negative_ttl=3600,
+                 max_entries=1024, clock=time.time):
+        self.table = table
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "negative_hits": 0, "disk_hits": 0, "expired": 0}
+
+        self._conn = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+                )
+
+    def get(self, key):
+        """Return the cached value (None for a negative entry) or MISS"""
+        now = self.clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    return self._hit(value)
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] > now:
+                        value = json.loads(row[0])
+                        self._remember(key, value, row[1])
+                        self.stats["disk_hits"] += 1
+                        return self._hit(value)
+                    self.stats["expired"] += 1
+
+            self.stats["misses"] += 1
+            return MISS
+
+    def set(self, key, value):
+        """Store value; None is cached with the shorter negative TTL"""
+        ttl = self.negative_ttl if value is None else self.ttl
+        expires_at = self.clock() + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                        (key, json.dumps(value), expires_at),
+                    )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(f"DELETE FROM {self.table}")
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _hit(self, value):
+        self.stats["hits"] += 1
+        if value is None:
+            self.stats["negative_hits"] += 1
+        return value
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+def open_lookup_cache(table, path=BARCODE_CACHE_PATH, ttl=BARCODE_CACHE_TTL, negative_ttl=BARCODE_NEGATIVE_TTL,
+                      max_entries=BARCODE_CACHE_SIZE):
+    """LookupCache for table in the file at path, memory-only if the file cannot be opened"""
+    try:
+        return LookupCache(path or None, table, ttl, negative_ttl, max_entries)
+    except (OSError, sqlite3.Error):
+        # e.g. a read-only home directory: lookups still work, just uncached across restarts
+        return LookupCache(None, table, ttl, negative_ttl, max_entries)
@@ -0,0 +1,209 @@
+import importlib.util
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from PIL import Image
+import pytesseract
+
+# Optional (requirements-ocr.txt): tesserocr keeps libtesseract loaded in-process, no
+# subprocess or temp files. Only the pool workers import it, after limiting OpenMP.
+TESSEROCR_AVAILABLE = importlib.util.find_spec("tesserocr") is not None
+
+# OCR_BACKEND: "auto" (tesserocr pool when available), "tesserocr" or "pytesseract"
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_WORKERS = min(int(os.getenv("OCR_WORKERS", os.cpu_count() or 1)), os.cpu_count() or 1)
+
+DATA_FIELDS = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf", "text"]
+
+# Per-process libtesseract handle, created once by the pool initializer
+_api = None
+
+
+def to_array(image):
+    """Return a contiguous uint8 array (grayscale or RGB) for OCR.
+
+    Arrays are passed through as-is, so colour arrays must already be RGB.
+    """
+    if isinstance(image, Image.Image):
+        image = np.array(image.convert("L") if image.mode not in ("L", "RGB") else image)
+    return np.ascontiguousarray(image, dtype=np.uint8)
+
+
+def parse_tsv(tsv):
+    """Parse Tesseract TSV output into the pytesseract Output.DICT layout"""
+    data = {field: [] for field in DATA_FIELDS}
+    for row in tsv.splitlines():
+        values = row.split("\t")
+        if len(values) < 11 or values[0] == "level":
+            continue
+        if len(values) == 11:
+            values.append("")
+        for field, value in zip(DATA_FIELDS, values):
+            if field == "text":
+                data[field].append(value)
+            elif field == "conf":
+                data[field].append(float(value))
+            else:
+                data[field].append(int(value))
+    return data
+
+
+def _init_worker(lang):
+    global _api
+    # One recognizer per process; stop OpenMP from oversubscribing the cores.
+    # OpenMP reads this when libtesseract loads, so set it before the import.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    import tesserocr
+    _api = tesserocr.PyTessBaseAPI(lang=lang)
+
+
+def _set_image(array):
+    height, width = array.shape[:2]
+    channels = 1 if array.ndim == 2 else array.shape[2]
+    _api.SetImageBytes(array.tobytes(), width, height, channels, width * channels)
+
+
+def _worker_image_to_string(array):
+    _set_image(array)
+    return _api.GetUTF8Text()
+
+
+def _worker_image_to_data(array):
+    _set_image(array)
+    return parse_tsv(_api.GetTSVText(0))
+
+
+class PytesseractBackend:
+    """Fallback: one tesseract subprocess per call, bounded to the core count"""
+
+    name = "pytesseract"
+
+    def __init__(self, workers=OCR_WORKERS, lang=OCR_LANG):
+        self.workers = workers
+        self.lang = lang
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def image_to_string(self, image):
+        with self._slots:
+            return pytesseract.image_to_string(Image.fromarray(to_array(image)), lang=self.lang)
+
+    def image_to_data(self, image):
+        with self._slots:
+            return pytesseract.image_to_data(
+                Image.fromarray(to_array(image)), lang=self.lang, output_type=pytesseract.Output.DICT
+            )
+
+    def map_to_data(self, images):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(self.image_to_data, images))
+
+
+class TesserocrPoolBackend:
+    """Pool of long-lived worker processes, each holding a libtesseract handle.
+
+    Images travel to the workers as in-memory arrays; nothing touches disk.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, workers=OCR_WORKERS, lang=OCR_LANG):
+        self.workers = workers
+        self.lang = lang
+        self._pool = None
+        self._lock = threading.Lock()
+        self._fallback = PytesseractBackend(workers, lang)
+
+    def _submit(self, func, image):
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the parent runs threads and holds SQLite
+                # connections, so workers start clean and build their own handle
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker, initargs=(self.lang,)
+                )
+            pool = self._pool
+        return pool.submit(func, to_array(image))
+
+    def _reset(self):
+        # A crashed worker takes the pool down; rebuild it next time
+        with self._lock:
+            self._pool = None
+
+    def _run(self, func, fallback, image):
+        try:
+            return self._submit(func, image).result()
+        except BrokenProcessPool:
+            self._reset()
+            return fallback(image)
+
+    def image_to_string(self, image):
+        return self._run(_worker_image_to_string, self._fallback.image_to_string, image)
+
+    def image_to_data(self, image):
+        return self._run(_worker_image_to_data, self._fallback.image_to_data, image)
+
+    def map_to_data(self, images):
+        """OCR many images concurrently, preserving order"""
+        try:
+            futures = [self._submit(_worker_image_to_data, image) for image in images]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            self._reset()
+            return self._fallback.map_to_data(images)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _create_backend(workers=OCR_WORKERS):
+    use_pool = OCR_BACKEND == "tesserocr" or (OCR_BACKEND == "auto" and TESSEROCR_AVAILABLE)
+    if use_pool and not TESSEROCR_AVAILABLE:
+        raise ImportError("OCR_BACKEND=tesserocr requires the tesserocr package (pip install -r requirements-ocr.txt)")
+    return TesserocrPoolBackend(workers) if use_pool else PytesseractBackend(workers)
+
+
+def get_backend():
+    """Return the process-wide OCR backend, created on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_backend()
+        return _backend
+
+
+def configure(workers):
+    """Replace the process-wide backend with one running at most `workers` OCR calls at once"""
+    global _backend
+    with _backend_lock:
+        if isinstance(_backend, TesserocrPoolBackend):
+            _backend.shutdown()
+        _backend = _create_backend(workers)
+        return _backend
+
+
+def image_to_string(image):
+    """OCR an image (PIL or array) to plain text"""
+    return get_backend().image_to_string(image)
+
+
+def image_to_data(image):
+    """OCR an image (PIL or array) to word boxes in pytesseract's DICT layout"""
+    return get_backend().image_to_data(image)
+
+
+def map_to_data(images):
+    """OCR several images, in parallel when the backend supports it"""
+    return get_backend().map_to_data(images)
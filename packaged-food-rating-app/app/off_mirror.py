@@ -0,0 +1,237 @@
+"""Local OpenFoodFacts mirror: a barcode-keyed SQLite table built from a bulk dump.
+
+Imports stream the OFF JSONL export (openfoodfacts-products.jsonl[.gz]) or
+the tab-separated CSV export line by line and upsert in batches, so memory
+stays flat however large the dump is. Only the fields evaluate_product uses
+are kept: name, ingredient text and the nutrients NUTRIENT_LIMITS scores.
+
+Delta files (the daily OFF JSONL deltas, or any newer dump) are imported
+the same way; a row is only replaced by one with an equal or newer
+last_modified_t, so replaying an old file never clobbers fresher data.
+
+Usage:
+    python off_mirror.py import openfoodfacts-products.jsonl.gz [--db PATH]
+    python off_mirror.py import delta.jsonl.gz
+    python off_mirror.py stats
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from lookup_cache import CACHE_DIR
+
+OFF_MIRROR_PATH = os.getenv("OFF_MIRROR_PATH", str(CACHE_DIR / "off_mirror.sqlite"))
+IMPORT_BATCH_SIZE = int(os.getenv("OFF_MIRROR_BATCH", 5000))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    code TEXT PRIMARY KEY,
+    product_name TEXT,
+    ingredients_text TEXT,
+    nutrients TEXT,
+    last_modified INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+UPSERT = """
+INSERT INTO products VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(code) DO UPDATE SET
+    product_name = excluded.product_name,
+    ingredients_text = excluded.ingredients_text,
+    nutrients = excluded.nutrients,
+    last_modified = excluded.last_modified
+WHERE excluded.last_modified >= products.last_modified
+"""
+
+
+def nutrient_keys():
+    """Nutrient fields worth keeping: the ones the scoring rules look at"""
+    from scoring import reference_data
+    return tuple(reference_data("NUTRIENT_LIMITS"))
+
+
+def barcode_variants(code):
+    """The code plus its UPC-A/EAN-13 twin (leading zero added or dropped)"""
+    code = code.strip()
+    if len(code) == 12:
+        return (code, "0" + code)
+    if len(code) == 13 and code.startswith("0"):
+        return (code, code[1:])
+    return (code,)
+
+
+def _open_text(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, encoding="utf-8", errors="replace", newline="")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row(code, name, ingredients, nutriments, last_modified, keys):
+    """Compact a dump record to a products row, or None if there is nothing to score"""
+    code = (code or "").strip()
+    if not code:
+        return None
+    nutrients = {}
+    for key in keys:
+        value = _number(nutriments.get(key))
+        if value is not None:
+            nutrients[key] = value
+    ingredients = ingredients or ""
+    if not ingredients and not nutrients:
+        return None
+    return (code, name or "", ingredients, json.dumps(nutrients, separators=(",", ":")),
+            int(_number(last_modified) or 0))
+
+
+def iter_jsonl(path, keys):
+    with _open_text(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            row = _row(record.get("code"), record.get("product_name"), record.get("ingredients_text"),
+                       record.get("nutriments") or {}, record.get("last_modified_t"), keys)
+            if row is not None:
+                yield row
+
+
+def iter_csv(path, keys):
+    # Some OFF text fields are far longer than csv's default field limit
+    csv.field_size_limit(sys.maxsize)
+    with _open_text(path) as f:
+        header = f.readline()
+        delimiter = "\t" if "\t" in header else ","
+        # The OFF export is tab-separated with unescaped quotes inside fields
+        quoting = csv.QUOTE_NONE if delimiter == "\t" else csv.QUOTE_MINIMAL
+        fieldnames = next(csv.reader(io.StringIO(header), delimiter=delimiter))
+        reader = csv.DictReader(f, fieldnames=fieldnames, delimiter=delimiter, quoting=quoting)
+        for record in reader:
+            row = _row(record.get("code"), record.get("product_name"), record.get("ingredients_text"),
+                       record, record.get("last_modified_t"), keys)
+            if row is not None:
+                yield row
+
+
+def iter_dump(path, keys):
+    name = str(path).lower().removesuffix(".gz")
+    if name.endswith((".jsonl", ".json", ".ndjson")):
+        return iter_jsonl(path, keys)
+    return iter_csv(path, keys)
+
+
+class OffMirror:
+    """Barcode -> product lookups against the local mirror table"""
+
+    def __init__(self, path=OFF_MIRROR_PATH):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def get(self, barcode):
+        """Return the product dict evaluate_product expects, or None if not mirrored"""
+        variants = barcode_variants(barcode)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT product_name, ingredients_text, nutrients FROM products "
+                f"WHERE code IN ({','.join('?' * len(variants))}) LIMIT 1", variants
+            ).fetchone()
+        if row is None:
+            return None
+        return {"product_name": row[0], "ingredients_text": row[1], "nutrients": json.loads(row[2])}
+
+    def import_rows(self, rows, batch_size=IMPORT_BATCH_SIZE):
+        """Upsert rows in batches of batch_size, one transaction each; returns the row count"""
+        total = 0
+        newest = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                newest = max(newest, self._write(batch))
+                total += len(batch)
+                batch = []
+        if batch:
+            newest = max(newest, self._write(batch))
+            total += len(batch)
+        if newest:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO meta VALUES ('last_modified', ?) ON CONFLICT(key) DO UPDATE "
+                    "SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))", (newest,)
+                )
+        return total
+
+    def import_file(self, path, batch_size=IMPORT_BATCH_SIZE):
+        """Stream a JSONL or CSV dump (optionally gzipped) into the mirror"""
+        return self.import_rows(iter_dump(path, nutrient_keys()), batch_size)
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+            meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        return {"path": self.path, "products": count, "last_modified": int(meta.get("last_modified", 0))}
+
+    def close(self):
+        self._conn.close()
+
+    def _write(self, batch):
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, batch)
+        return max(row[4] for row in batch)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_default_mirror():
+    """The mirror at OFF_MIRROR_PATH, or None until one has been imported there"""
+    global _default
+    if _default is None and OFF_MIRROR_PATH and os.path.exists(OFF_MIRROR_PATH):
+        with _default_lock:
+            if _default is None:
+                _default = OffMirror(OFF_MIRROR_PATH)
+    return _default
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and inspect the local OpenFoodFacts mirror")
+    parser.add_argument("--db", default=OFF_MIRROR_PATH, help="mirror database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="import a full dump or a delta file")
+    importer.add_argument("dumps", nargs="+", help="JSONL or CSV export, optionally .gz")
+    importer.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    commands.add_parser("stats", help="show the product count and newest modification time")
+    args = parser.parse_args(argv)
+
+    mirror = OffMirror(args.db)
+    if args.command == "import":
+        for dump in args.dumps:
+            start = time.perf_counter()
+            rows = mirror.import_file(dump, args.batch_size)
+            print(f"{dump}: {rows} products in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    print(json.dumps(mirror.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Speculative image analysis: barcode decoding and ingredient OCR in parallel.
+
+Run one after another, decode, product lookup and OCR add up, and a label
+without a usable barcode pays for all three. Here OCR starts on a pool
+thread as soon as the frame is decoded, while the calling thread decodes
+barcodes and resolves each one the moment it appears:
+
+- a complete product (ingredients or nutrients) wins: OCR still queued is
+  cancelled, OCR already running finishes in the background and is ignored;
+- otherwise the OCR result supplies the ingredients and the nutrients read
+  from the nutrition table, so latency is about max(decode + lookup, OCR)
+  instead of the sum, and a label is scored without any network lookup.
+
+SPECULATIVE_OCR=0 (or speculative=False, as batch workers use) runs OCR in
+the calling thread and only when the lookup did not produce a product.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+from product_resolver import is_complete, resolve_product
+from scoring import evaluate_product
+
+SPECULATIVE_OCR = os.getenv("SPECULATIVE_OCR", "1") == "1"
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", 4))
+
+# Shared by all requests; bounded so abandoned OCR cannot pile up threads
+_executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative-ocr")
+
+
+def ocr_label(frame, cancelled=None):
+    """OCR a label: {"text", "ingredients", "nutrition"}, or None if cancelled first"""
+    from vision_handler import detect_ingredients_section, extract_nutrition_facts, ocr_layout
+    if cancelled is not None and cancelled.is_set():
+        return None
+    # One OCR pass serves the section detector, the fallback text and, for
+    # labels without table rules, the nutrition parser
+    layout = ocr_layout(frame)
+    if cancelled is not None and cancelled.is_set():
+        return None
+    return {
+        "text": layout["text"],
+        "ingredients": detect_ingredients_section(frame, layout=layout) or layout["text"],
+        "nutrition": extract_nutrition_facts(frame, layout=layout),
+    }
+
+
+def _ocr_in_trace(trace, frame, cancelled):
+    with tracing.attach(trace), tracing.span("speculative.ocr"):
+        return ocr_label(frame, cancelled)
+
+
+def _finish_ocr(future, frame):
+    """Result of the speculative OCR, running it here if it never started"""
+    if future is None or future.cancel():
+        return ocr_label(frame)
+    return future.result()
+
+
+def analyze_image(image, speculative=None):
+    """Decode barcodes and resolve the product, with OCR as the fallback; then score.
+
+    image may be encoded bytes, an upload, a PIL image, an array or a Frame.
+    """
+    # Vision stack (cv2, pyzbar, tesseract) is loaded on the first image only
+    from frame import as_frame
+    from vision_handler import decode_barcode
+    speculative = SPECULATIVE_OCR if speculative is None else speculative
+    # Decode once and build the 1000 px level both stages read, before they
+    # run concurrently on the frame's shared arrays and pyramid
+    frame = as_frame(image)
+    frame.gray_at_width(1000)
+    result = {"barcodes": [], "product": None, "ocr_text": "",
+              "nutrients": {}, "ingredients": "", "nutrition": None, "score": None}
+
+    cancelled = threading.Event()
+    future = _executor.submit(_ocr_in_trace, tracing.current(), frame, cancelled) if speculative else None
+    try:
+        result["barcodes"] = decode_barcode(frame)
+        for barcode in result["barcodes"]:
+            product = resolve_product(barcode["data"])
+            if product:
+                result["product"] = product
+                result["nutrients"] = product.get("nutrients", {})
+                result["ingredients"] = product.get("ingredients_text", "")
+                break
+    except BaseException:
+        cancelled.set()
+        if future is not None:
+            future.cancel()
+        raise
+
+    if is_complete(result["product"]):
+        cancelled.set()
+        if future is not None:
+            tracing.count("speculative_ocr_cancelled" if future.cancel() else "speculative_ocr_discarded")
+    else:
+        label = _finish_ocr(future, frame)
+        if future is not None:
+            tracing.count("speculative_ocr_used")
+        result["ocr_text"] = label["text"]
+        result["ingredients"] = result["ingredients"] or label["ingredients"]
+        result["nutrition"] = label["nutrition"]
+        result["nutrients"] = result["nutrients"] or label["nutrition"]["nutrients"]
+    if result["nutrients"] or result["ingredients"]:
+        result["score"] = evaluate_product(result["nutrients"], result["ingredients"])
+    return result
@@ -0,0 +1,326 @@
+"""Headless scan-and-score pipeline.
+
+Batch mode scores images and barcodes through a process pool and appends
+JSONL records; re-running with the same output file resumes where it
+stopped. Serve mode exposes the same pipeline over a small HTTP API.
+
+    python pipeline.py batch IMAGE_DIR barcodes.txt 8901234567890 -o results.jsonl
+    python pipeline.py serve --port 8080
+
+Point OFF_API_URL, UPCITEMDB_API_URL, BARCODESPIDER_API_URL and
+GOOGLE_SEARCH_URL at stub servers to run fully offline.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import enrichment
+import tracing
+from analysis_cache import get_default_cache
+from orchestrator import analyze_image
+from product_resolver import resolve_product
+from scoring import evaluate_product
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", os.cpu_count() or 1))
+API_QUEUE_SIZE = int(os.getenv("API_QUEUE_SIZE", 32))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", 60))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+
+
+def analyze_image_bytes(image_bytes, cache=None, image=None):
+    """analyze_image through a content-addressed cache (the process default if None)"""
+    cache = cache or get_default_cache()
+    result = cache.get(image_bytes)
+    if result is None:
+        result = analyze_image(image_bytes if image is None else image)
+        # A barcode without a product may be a transient lookup failure; retry next time
+        if result["product"] or not result["barcodes"]:
+            cache.set(image_bytes, result)
+    return result
+
+
+def analyze_barcode(barcode):
+    """Resolve a typed-in barcode and score the product"""
+    product = resolve_product(barcode)
+    result = {"barcodes": [{"data": barcode, "type": "input", "method": None, "region": None}],
+              "product": product, "ocr_text": "", "nutrients": {}, "ingredients": "", "score": None}
+    if product:
+        result["nutrients"] = product.get("nutrients", {})
+        result["ingredients"] = product.get("ingredients_text", "")
+    if result["nutrients"] or result["ingredients"]:
+        result["score"] = evaluate_product(result["nutrients"], result["ingredients"])
+    return result
+
+
+def to_record(kind, source, result):
+    """Flatten an analysis result into a JSON-serializable record"""
+    product = result["product"] or {}
+    score, pros, cons, missing = result["score"] or (None, [], [], [])
+    # Queue unmatched ingredients for a web lookup (no-op unless ENRICHMENT=1)
+    enrichment.submit(missing)
+    return {
+        "input": source,
+        "kind": kind,
+        "barcodes": [barcode["data"] for barcode in result["barcodes"]],
+        "product_name": product.get("product_name"),
+        "source": product.get("source"),
+        "ingredients": result["ingredients"],
+        "score": score,
+        "pros": pros,
+        "cons": cons,
+        "missing": missing,
+        # Web results for missing ingredients, once the background enrichment found some
+        "web": enrichment.lookup_many(missing),
+        "error": None,
+    }
+
+
+def process_item(item):
+    """Score one ("image", path) or ("barcode", code) item; errors become records"""
+    kind, source = item
+    start = time.perf_counter()
+    try:
+        with tracing.request("batch." + kind, input=source):
+            if kind == "image":
+                with open(source, "rb") as f:
+                    # Batch workers already fill every core; no speculative OCR
+                    record = to_record(kind, source, analyze_image(f.read(), speculative=False))
+            else:
+                record = to_record(kind, source, analyze_barcode(source))
+    except Exception as e:
+        record = {"input": source, "kind": kind, "error": f"{type(e).__name__}: {e}"}
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+def iter_items(inputs):
+    """Expand CLI inputs: image directories, image files, barcode list files, barcodes"""
+    for value in inputs:
+        path = Path(value)
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.suffix.lower() in IMAGE_SUFFIXES:
+                    yield "image", str(child)
+        elif path.suffix.lower() in IMAGE_SUFFIXES:
+            yield "image", str(path)
+        elif path.is_file():
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        yield "barcode", line.strip()
+        else:
+            yield "barcode", value
+
+
+def load_checkpoint(output_path):
+    """Inputs already scored without error in an existing output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Truncated last line from an interrupted run
+                continue
+            if record.get("error") is None:
+                done.add((record["kind"], record["input"]))
+            else:
+                done.discard((record["kind"], record["input"]))
+    return done
+
+
+def _init_batch_worker():
+    # Workers are spawned, not forked: SQLite connections (lookup caches, OFF
+    # mirror) and the parent's threads must not be shared across a fork, so
+    # each worker opens its own on first use.
+    # Parallelism comes from the batch pool; one OCR call at a time per worker
+    if "ocr_backend" in sys.modules:
+        sys.modules["ocr_backend"].configure(1)
+    else:
+        os.environ["OCR_WORKERS"] = "1"
+
+
+def run_batch(items, output_path, workers=PIPELINE_WORKERS, resume=True):
+    """Score items in a process pool, appending one JSONL record per item.
+
+    Items already recorded in output_path are skipped when resume is set,
+    so an interrupted run picks up where it stopped. Returns a summary dict.
+    """
+    done = load_checkpoint(output_path) if resume else set()
+    items = list(dict.fromkeys(items))
+    todo = [item for item in items if item not in done]
+    summary = {"skipped": len(items) - len(todo), "scored": 0, "errors": 0}
+    start = time.perf_counter()
+
+    if resume and os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            # Terminate a record cut off by an interrupted run
+            partial = f.read() != b"\n"
+        if partial:
+            with open(output_path, "a") as out:
+                out.write("\n")
+
+    with open(output_path, "a" if resume else "w") as out, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_init_batch_worker) as pool:
+        for record in pool.map(process_item, todo, chunksize=4):
+            out.write(json.dumps(record) + "\n")
+            # Flush per record so the file is a usable checkpoint at any point
+            out.flush()
+            summary["errors" if record["error"] else "scored"] += 1
+
+    summary["seconds"] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+class WorkQueue:
+    """Bounded job queue drained by a fixed number of worker threads"""
+
+    def __init__(self, workers=PIPELINE_WORKERS, max_queued=API_QUEUE_SIZE):
+        self._jobs = queue.Queue(maxsize=max_queued)
+        self._threads = [
+            threading.Thread(target=self._work, name=f"pipeline-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, func, *args):
+        """Queue a call and return its Future; raises queue.Full when saturated"""
+        future = Future()
+        self._jobs.put_nowait((future, func, args))
+        return future
+
+    def qsize(self):
+        return self._jobs.qsize()
+
+    def _work(self):
+        while True:
+            future, func, args = self._jobs.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            self._jobs.task_done()
+
+
+def score_image_bytes(image_bytes):
+    with tracing.request("http.image", bytes=len(image_bytes)):
+        return to_record("image", None, analyze_image_bytes(image_bytes))
+
+
+def score_barcode(barcode):
+    with tracing.request("http.barcode", barcode=barcode):
+        return to_record("barcode", barcode, analyze_barcode(barcode))
+
+
+class PipelineHandler(BaseHTTPRequestHandler):
+    """GET /health, GET /metrics, GET /barcode/<code>, POST /image (raw image bytes)"""
+
+    work_queue = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "queued": self.work_queue.qsize()})
+        elif self.path == "/metrics":
+            self._send_text(200, tracing.render_prometheus(), "text/plain; version=0.0.4")
+        elif self.path.startswith("/barcode/"):
+            barcode = self.path[len("/barcode/"):]
+            if not barcode.isdigit():
+                self._send(400, {"error": "barcode must be numeric"})
+                return
+            self._run(score_barcode, barcode)
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/image":
+            self._send(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if not 0 < length <= MAX_UPLOAD_BYTES:
+            self._send(413 if length else 400, {"error": "missing or oversized image body"})
+            return
+        self._run(score_image_bytes, self.rfile.read(length))
+
+    def _run(self, func, arg):
+        try:
+            future = self.work_queue.submit(func, arg)
+        except queue.Full:
+            tracing.count("http_rejected")
+            self._send(503, {"error": "server busy"}, {"Retry-After": "1"})
+            return
+        try:
+            self._send(200, future.result(timeout=API_TIMEOUT))
+        except TimeoutError:
+            future.cancel()
+            self._send(504, {"error": "timed out"})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _send(self, status, body, headers=None):
+        self._send_text(status, json.dumps(body), "application/json", headers)
+
+    def _send_text(self, status, text, content_type, headers=None):
+        payload = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8080, workers=PIPELINE_WORKERS, max_queued=API_QUEUE_SIZE):
+    handler = type("Handler", (PipelineHandler,), {"work_queue": WorkQueue(workers, max_queued)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless food scan-and-score pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="score images and barcodes to JSONL")
+    batch.add_argument("inputs", nargs="+", help="image files/directories, barcode list files or barcodes")
+    batch.add_argument("-o", "--output", default="results.jsonl")
+    batch.add_argument("-w", "--workers", type=int, default=PIPELINE_WORKERS)
+    batch.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming")
+
+    serve = commands.add_parser("serve", help="run the HTTP API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("-w", "--workers", type=int, default=PIPELINE_WORKERS)
+    serve.add_argument("--queue", type=int, default=API_QUEUE_SIZE, help="max requests waiting for a worker")
+
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        summary = run_batch(iter_items(args.inputs), args.output, args.workers, resume=not args.no_resume)
+        print(json.dumps(summary))
+    else:
+        server = make_server(args.host, args.port, args.workers, args.queue)
+        print(f"Serving on http://{args.host}:{args.port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from input_handler import LOOKUP_TIMEOUT, lookup_barcode, session
+from lookup_cache import MISS, open_lookup_cache
+import tracing
+from tracing import traced
+
+# Fallback sources (override the URLs to point at local stub servers)
+UPCITEMDB_API_URL = os.getenv("UPCITEMDB_API_URL", "https://api.upcitemdb.com/prod/trial/lookup")
+BARCODESPIDER_API_URL = os.getenv("BARCODESPIDER_API_URL", "https://barcodespider.com/api")
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+# Resolved products, in the barcode cache file; opened on first lookup
+_resolved_cache = None
+_resolved_cache_lock = threading.Lock()
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="resolver")
+
+
+def get_resolved_cache():
+    """The resolved-product cache, opened on first use rather than at import"""
+    global _resolved_cache
+    if _resolved_cache is None:
+        with _resolved_cache_lock:
+            if _resolved_cache is None:
+                _resolved_cache = open_lookup_cache("resolved")
+    return _resolved_cache
+
+
+def make_product(product_name="", ingredients_text="", nutrients=None):
+    """Build the {product_name, ingredients_text, nutrients} shape evaluate_product expects"""
+    return {
+        "product_name": product_name or "",
+        "ingredients_text": ingredients_text or "",
+        "nutrients": nutrients or {},
+    }
+
+
+def is_complete(product):
+    """A hit is worth returning early only if it can actually be scored"""
+    return bool(product and (product.get("ingredients_text") or product.get("nutrients")))
+
+
+# Fetchers return None only for a definite "not found" and raise when the
+# source could not answer (rate limited, server error, unreachable), so the
+# failure reaches the circuit breaker and is not cached as a miss.
+
+def check_response(response):
+    """True for a 200, False for a 404; raises requests.HTTPError otherwise"""
+    if response.status_code == 404:
+        return False
+    response.raise_for_status()
+    return response.status_code == 200
+
+
+def fetch_openfoodfacts(barcode, timeout):
+    found, product = lookup_barcode(barcode)
+    if found is None:
+        raise requests.HTTPError(f"OpenFoodFacts lookup failed for {barcode}")
+    return product
+
+
+def fetch_upcitemdb(barcode, timeout):
+    response = session.get(UPCITEMDB_API_URL, params={"upc": barcode}, timeout=timeout)
+    if not check_response(response):
+        return None
+    items = response.json().get("items", [])
+    if not items:
+        return None
+    item = items[0]
+    return make_product(item.get("title"), item.get("ingredients"), item.get("nutrients"))
+
+
+def fetch_barcodespider(barcode, timeout):
+    response = session.get(f"{BARCODESPIDER_API_URL}/{barcode}", headers=BROWSER_HEADERS, timeout=timeout)
+    if not check_response(response):
+        return None
+    data = response.json()
+    attributes = data.get("item_attributes") or data
+    title = attributes.get("title") or attributes.get("product_name")
+    if not title:
+        return None
+    return make_product(title, attributes.get("ingredients"))
+
+
+class CircuitBreaker:
+    """Skip a source after repeated failures, then retry it after a cool-down"""
+
+    def __init__(self, max_failures=3, reset_after=60, clock=time.monotonic):
+        self.max_failures = max_failures
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: let one call through once the cool-down has passed
+            if self.clock() - self.opened_at >= self.reset_after:
+                self.opened_at = self.clock()
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.max_failures:
+                    self.opened_at = self.clock()
+
+
+class Source:
+    def __init__(self, name, fetch, timeout, priority):
+        self.name = name
+        self.fetch = fetch
+        self.timeout = timeout
+        self.priority = priority
+        self.breaker = CircuitBreaker()
+
+
+# Lower priority value wins when results are merged
+SOURCES = [
+    Source("openfoodfacts", fetch_openfoodfacts, LOOKUP_TIMEOUT, 0),
+    Source("upcitemdb", fetch_upcitemdb, float(os.getenv("UPCITEMDB_TIMEOUT", 5)), 1),
+    Source("barcodespider", fetch_barcodespider, float(os.getenv("BARCODESPIDER_TIMEOUT", 5)), 2),
+]
+
+
+def _run_source(source, barcode):
+    try:
+        with tracing.span("resolver." + source.name):
+            product = source.fetch(barcode, source.timeout)
+    except Exception:
+        source.breaker.record(False)
+        tracing.count("resolver_errors")
+        raise
+    source.breaker.record(True)
+    return product
+
+
+def merge_products(results):
+    """Merge hits field by field, preferring higher-priority sources"""
+    merged = make_product()
+    sources = []
+    for source, product in sorted(results, key=lambda item: item[0].priority):
+        used = False
+        for key in ("product_name", "ingredients_text", "nutrients"):
+            if product.get(key) and not merged[key]:
+                merged[key] = product[key]
+                used = True
+        if used:
+            sources.append(source.name)
+    merged["source"] = ", ".join(sources)
+    return merged
+
+
+@traced("resolver.resolve")
+def resolve_product(barcode: str, merge=False, sources=None, use_cache=True):
+    """Query all product sources concurrently and return the best hit or None.
+
+    By default the first scoreable hit (ingredients or nutrients) wins and
+    slower sources are abandoned. With merge=True every source is awaited
+    up to its deadline and the hits are merged by priority. Either way the
+    wait is bounded by the slowest single source timeout.
+    """
+    if use_cache:
+        cached = get_resolved_cache().get(barcode)
+        if cached is not MISS:
+            return cached
+
+    candidates = sources or SOURCES
+    sources = [s for s in candidates if s.breaker.allow()]
+    start = time.monotonic()
+    pending = {_executor.submit(_run_source, s, barcode): s for s in sources}
+    deadlines = {future: start + s.timeout for future, s in pending.items()}
+    results = []
+    # Sources skipped by an open breaker were never asked: count them as failed
+    errors = len(candidates) - len(sources)
+
+    while pending:
+        remaining = max(deadlines[f] for f in pending) - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            source = pending.pop(future)
+            try:
+                product = future.result()
+            except Exception:
+                errors += 1
+                continue
+            if product:
+                results.append((source, product))
+                if not merge and is_complete(product):
+                    pending.clear()
+                    break
+        # Stop waiting on sources that are past their own deadline
+        now = time.monotonic()
+        for future in [f for f in pending if deadlines[f] <= now]:
+            pending.pop(future)
+            errors += 1
+
+    if results:
+        product = merge_products(results)
+    else:
+        product = None
+
+    # Only cache definite answers: a miss is cached only when every source
+    # answered "not found", not when one was skipped, failed or timed out
+    if use_cache and (product is not None or not errors):
+        get_resolved_cache().set(barcode, product)
+    return product
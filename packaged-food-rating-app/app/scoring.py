@@ -1,155 +1,372 @@
 import json
+import os
 import re
+import sqlite3
+import threading
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
-from web_fallback import google_search
+from additive_index import AdditiveIndex
+from tracing import traced
+
+# numpy and pandas are imported inside the batch-scoring functions so that
+# single-product scoring (and importing this module) never loads them
 
 # Get absolute path to reference files
 current_dir = Path(__file__).parent
 references_dir = current_dir / "references"
 
-# Load DBs using absolute paths
-with open(references_dir / "fssai_regulations.json", "r", encoding="utf-8") as f:
-    FSSAI_DB = json.load(f)
+def load_additive_table(path):
+    """Load the flat additive table compiled by tests/merge.py, one entry per additive.
+
+    The table has a row per additive x food category; each entry keeps them
+    as limits {category: mg/kg or None}. max_permitted is the most permissive
+    limit, and absent when some category allows the additive without one.
+    """
+    # Read-only, immutable open: no locks or journal, pages shared via the OS cache
+    conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT code, name, category, class, max_permitted FROM additives "
+            "ORDER BY name COLLATE NOCASE, category"
+        ).fetchall()
+    finally:
+        conn.close()
+    entries, classes = {}, {}
+    for code, name, category, additive_class, max_permitted in rows:
+        key = name.lower()
+        entry = entries.setdefault(key, {"name": name, "limits": {}})
+        if code and "code" not in entry:
+            entry["code"] = code
+        if additive_class:
+            classes.setdefault(key, Counter())[additive_class] += 1
+        if category:
+            limits = entry["limits"]
+            category = category.lower()
+            # Several rows for one category: keep the larger limit; None (no limit) wins
+            if category not in limits or limits[category] is not None:
+                limits[category] = None if max_permitted is None else max(limits.get(category, 0), max_permitted)
+    for key, entry in entries.items():
+        limits = list(entry["limits"].values())
+        if limits and None not in limits:
+            entry["max_permitted"] = max(limits)
+        if key in classes:
+            # Most frequent functional class first
+            entry["classes"] = [name for name, _ in classes[key].most_common()]
+            entry["class"] = entry["classes"][0]
+    return list(entries.values())
+
+def load_fssai_db():
+    """Load the additive DB, preferring the precompiled SQLite table"""
+    additives_table = references_dir / "fssai_additives.sqlite"
+    if additives_table.exists():
+        return load_additive_table(additives_table)
+    with open(references_dir / "fssai_regulations.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_nutrient_limits():
+    with open(references_dir / "nutrient_limits.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# Reference data is loaded on first use, not at import time
+_REFERENCE_LOADERS = {"FSSAI_DB": load_fssai_db, "NUTRIENT_LIMITS": load_nutrient_limits}
+_reference_lock = threading.Lock()
+
+def reference_data(name):
+    """Return FSSAI_DB or NUTRIENT_LIMITS, loading it once"""
+    value = globals().get(name)
+    if value is None:
+        with _reference_lock:
+            value = globals().get(name)
+            if value is None:
+                value = _REFERENCE_LOADERS[name]()
+                # Later lookups (and assignments in tests) hit the module global directly
+                globals()[name] = value
+    return value
+
+def __getattr__(name):
+    # Keeps `scoring.FSSAI_DB` / `from scoring import NUTRIENT_LIMITS` working lazily
+    if name in _REFERENCE_LOADERS:
+        return reference_data(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-with open(references_dir / "nutrient_limits.json", "r", encoding="utf-8") as f:
-    NUTRIENT_LIMITS = json.load(f)
+# Additive index is built lazily on first use and reused while the DB is unchanged
+_additive_index = None
+_additive_index_source = None
 
+# Per-token memo size for normalization, parsing and DB matches. The same
+# tokens ("sugar", "salt", "E471") recur across almost every product.
+INGREDIENT_MEMO_SIZE = int(os.getenv("INGREDIENT_MEMO_SIZE", 65536))
+
+# Minimum confidence for an OCR-tolerant fuzzy additive match (above 1 disables it)
+FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", 0.8))
+
+# Precompiled patterns for ingredient parsing
+PARENTHESES_RE = re.compile(r'\(.*?\)')
+PERCENT_RE = re.compile(r'\d+\.?\d*\s*%')
+E_NUMBER_RE = re.compile(r'[Ee]-?(\d{3}[a-zA-Z]?)')
+INGREDIENT_SPLIT_RE = re.compile(r',|\(|\)')
+
+# One token per separator or quantity; everything in between is ingredient text
+INGREDIENT_TOKEN_RE = re.compile(
+    r'(?P<sep>[,;()\[\]\n])|(?P<qty>(\d+(?:\.\d+)?)\s*(mg/kg|g/kg|%))',
+    re.I
+)
+
+# Multipliers to mg/kg for label quantities
+UNIT_TO_MG_PER_KG = {'mg/kg': 1, 'g/kg': 1000, '%': 10000}
+
+INGREDIENT_REPLACEMENTS = {
+    'acidity regulator': 'acidity regulators',
+    'emulsifier': 'emulsifiers',
+    'flavour enhancer': 'flavour enhancers',
+    'stabilizer': 'stabilizers',
+    'preservative': 'preservatives'
+}
+
+@lru_cache(maxsize=INGREDIENT_MEMO_SIZE)
 def normalize_ingredient(text):
     """Normalize ingredient names for better matching"""
     # Remove percentages and parentheses
-    text = re.sub(r'\(.*?\)', '', text)
-    text = re.sub(r'\d+\.?\d*\s*%', '', text)
+    text = PARENTHESES_RE.sub('', text)
+    text = PERCENT_RE.sub('', text)
     
     # Convert E-numbers to standard format
-    text = re.sub(r'[Ee]-?(\d{3}[a-zA-Z]?)', r'E\1', text)
+    text = E_NUMBER_RE.sub(r'E\1', text)
     
     # Handle common variations
-    replacements = {
-        'acidity regulator': 'acidity regulators',
-        'emulsifier': 'emulsifiers',
-        'flavour enhancer': 'flavour enhancers',
-        'stabilizer': 'stabilizers',
-        'preservative': 'preservatives'
-    }
-    
-    for old, new in replacements.items():
+    for old, new in INGREDIENT_REPLACEMENTS.items():
         text = text.replace(old, new)
     
     return text.strip().lower()
 
+@lru_cache(maxsize=INGREDIENT_MEMO_SIZE)
+def _parse_item(ing):
+    """Parsed tokens of one list item: its E-numbers, then its normalized name"""
+    cleaned = [f'E{num}' for num in E_NUMBER_RE.findall(ing)]
+    name = normalize_ingredient(ing)
+    if name:
+        cleaned.append(name)
+    return tuple(cleaned)
+
 def parse_ingredients(ingredients_text):
     """Break down complex ingredient list into individual ingredients"""
     # Split on commas and parentheses
-    ingredients = re.split(r',|\(|\)', ingredients_text)
+    ingredients = INGREDIENT_SPLIT_RE.split(ingredients_text)
     
-    # Clean up each ingredient
+    # Clean up each ingredient (memoized per item)
     cleaned = []
     for ing in ingredients:
         ing = ing.strip()
         if ing:
-            # Extract E-numbers
-            e_nums = re.findall(r'[Ee]-?(\d{3}[a-zA-Z]?)', ing)
-            if e_nums:
-                cleaned.extend([f'E{num}' for num in e_nums])
-            
-            # Extract ingredient name
-            name = normalize_ingredient(ing)
-            if name:
-                cleaned.append(name)
+            cleaned.extend(_parse_item(ing))
     
     return cleaned
 
-def search_additives(ingredients_text, fssai_db):
-    """Enhanced additive search with better matching"""
-    matches = []
-    ingredients = parse_ingredients(ingredients_text)
-    
-    # Convert FSSAI DB entries to normalized format
-    fssai_normalized = {}
-    for entry in fssai_db:
-        if isinstance(entry, dict):
-            name = normalize_ingredient(entry.get('name', ''))
-            code = entry.get('code', '').lower()
-            if name:
-                fssai_normalized[name] = entry
-            if code:
-                fssai_normalized[code] = entry
-        elif isinstance(entry, str):
-            name = normalize_ingredient(entry)
-            if name:
-                fssai_normalized[name] = {'name': entry}
-    
-    # Search for matches
-    for ingredient in ingredients:
-        # Direct match
-        if ingredient in fssai_normalized:
-            matches.append(fssai_normalized[ingredient])
+def tokenize_ingredients(ingredients_text):
+    """Extract (ingredient, quantity in mg/kg, label unit) triples in one pass.
+
+    A quantity belongs to the ingredient text right before it, or to the
+    previous ingredient when it stands alone, as in "sodium benzoate (150 mg/kg)".
+    """
+    triples = []
+    owner = ''
+    pos = 0
+    for token in INGREDIENT_TOKEN_RE.finditer(ingredients_text):
+        text = ingredients_text[pos:token.start()].strip()
+        pos = token.end()
+        if text:
+            owner = text
+        if token.group('sep') or not owner:
             continue
-        
-        # Partial match
-        for db_name, entry in fssai_normalized.items():
-            if ingredient in db_name or db_name in ingredient:
-                matches.append(entry)
-                break
-    
-    return matches
+        unit = token.group(4).lower()
+        triples.append((owner, float(token.group(3)) * UNIT_TO_MG_PER_KG[unit], unit))
+    return triples
 
-def evaluate_product(nutrients, ingredients_text):
-    """Evaluate product health score based on nutrients and ingredients"""
-    score = 100
+def get_additive_index(fssai_db):
+    """Return the precompiled additive index for fssai_db, building it once"""
+    global _additive_index, _additive_index_source
+    if _additive_index is None or _additive_index_source is not fssai_db:
+        _additive_index = AdditiveIndex(fssai_db, normalize_ingredient, INGREDIENT_MEMO_SIZE)
+        _additive_index_source = fssai_db
+    return _additive_index
+
+def clear_ingredient_memos():
+    """Drop memoized tokens and the additive index (e.g. after editing FSSAI_DB in place)"""
+    global _additive_index, _additive_index_source
+    normalize_ingredient.cache_clear()
+    _parse_item.cache_clear()
+    _additive_index = _additive_index_source = None
+
+def ingredient_memo_stats():
+    """Hit/miss counts and hit rate of each per-token memo"""
+    memos = {"normalize": normalize_ingredient, "parse": _parse_item}
+    if _additive_index is not None:
+        memos["match"] = _additive_index.lookup
+        memos["fuzzy_match"] = _additive_index.lookup_scored
+    stats = {}
+    for name, memo in memos.items():
+        info = memo.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize,
+                       "hit_rate": info.hits / lookups if lookups else 0.0}
+    return stats
+
+@traced("scoring.search_additives")
+def search_additives(ingredients_text, fssai_db, ingredients=None):
+    """Enhanced additive search with better matching (pass already parsed ingredients to skip parsing)"""
+    if ingredients is None:
+        ingredients = parse_ingredients(ingredients_text)
+    return get_additive_index(fssai_db).match(ingredients)
+
+@traced("scoring.search_additives_scored")
+def search_additives_scored(ingredients_text, fssai_db, ingredients=None, threshold=None):
+    """Like search_additives, tolerating OCR misreads: returns (ingredient, entry, confidence) hits.
+
+    Exact and substring matches have confidence 1.0; fuzzy guesses report
+    their similarity, at least threshold (FUZZY_MATCH_THRESHOLD by default).
+    """
+    if ingredients is None:
+        ingredients = parse_ingredients(ingredients_text)
+    threshold = FUZZY_MATCH_THRESHOLD if threshold is None else threshold
+    index = get_additive_index(fssai_db)
+    hits = []
+    for ingredient in ingredients:
+        if threshold > 1:
+            entry, confidence = index.lookup(ingredient), 1.0
+        else:
+            entry, confidence = index.lookup_scored(ingredient, threshold)
+        if entry is not None:
+            hits.append((ingredient, entry, confidence))
+    return hits
+
+def label_quantities(ingredients_text, hits, fssai_db):
+    """{id(entry): mg/kg} for hits whose quantity is declared on the label.
+
+    A quantity belongs to the hit only if its owner text names the entry:
+    an exact name or code, the entry's full name inside it, or the misread
+    a fuzzy guess came from. Loose substring hits ("salt" in "... and its
+    salts") never take a quantity.
+    """
+    index = get_additive_index(fssai_db)
+    # Each matched entry once, with its normalized name and the misreads it was guessed from
+    pending = {}
+    for ingredient, entry, confidence in hits:
+        name, guesses = pending.setdefault(id(entry), (normalize_ingredient(entry.get('name', '')), []))
+        if confidence < 1.0:
+            guesses.append(ingredient)
+    quantities = {}
+    for owner, qty_val, unit in tokenize_ingredients(ingredients_text):
+        if not pending:
+            break
+        tokens = parse_ingredients(owner)
+        owner_name = normalize_ingredient(owner)
+        exact = {id(index.exact.get(token) or index.codes.get(token.lower())) for token in tokens}
+        for key, (name, guesses) in list(pending.items()):
+            if (key in exact or (name and name in owner_name)
+                    or (owner_name and any(owner_name in guess for guess in guesses))):
+                quantities[key] = qty_val
+                del pending[key]
+    return quantities
+
+# Functional classes of the compiled table reported like the JSON DB's categories
+SYNTHETIC_COLOUR_CLASSES = {'colours synthetic', 'red', 'yellow', 'blue', 'green'}
+
+def additive_limit(entry, category=None):
+    """Limit in mg/kg for entry: the product category's if known, else the most permissive (None: no check)"""
+    limits = entry.get('limits')
+    if category and limits:
+        wanted = category.strip().lower()
+        if wanted in limits:
+            return limits[wanted]
+        for name, limit in limits.items():
+            # "dried fruits" also matches "Dried fruits and nuts"
+            if name in wanted or wanted in name:
+                return limit
+    return entry.get('max_permitted')
+
+def additive_kind(entry):
+    """'preservative', 'artificial color', 'vitamin', 'mineral', 'fiber' or ''"""
+    for kind in entry.get('classes') or [entry.get('class') or entry.get('category') or '']:
+        kind = kind.lower()
+        if 'preservative' in kind or kind == 'class ii':
+            return 'preservative'
+        if kind in SYNTHETIC_COLOUR_CLASSES or kind == 'artificial color':
+            return 'artificial color'
+        if kind in ('vitamin', 'mineral', 'fiber'):
+            return kind
+    return ''
+
+@traced("scoring.ingredients")
+def _score_ingredients(ingredients_text, category=None):
+    """Score the ingredient list: returns (score delta, pros, cons, missing)"""
+    score = 0
     pros, cons, missing = [], [], []
     
     # Parse ingredients first
     ingredients = parse_ingredients(ingredients_text)
     
-    # Check each ingredient against FSSAI DB
-    matches = search_additives(ingredients_text, FSSAI_DB)
+    # Check each ingredient against FSSAI DB (fuzzy guesses for OCR misreads)
+    fssai_db = reference_data("FSSAI_DB")
+    hits = search_additives_scored(ingredients_text, fssai_db, ingredients)
     found_ingredients = set()
     
-    if matches:
-        for match in matches:
+    # Quantity declared next to each matched additive on the label
+    quantities = label_quantities(ingredients_text, hits, fssai_db) if hits else {}
+    
+    if hits:
+        for ingredient, match, confidence in hits:
             name = match.get('name', 'Unknown additive')
             found_ingredients.add(normalize_ingredient(name))
+            code = match.get('code', '').lower()
+            if code:
+                # Its upper-cased twin from parse_ingredients ("E211") normalizes to this
+                found_ingredients.add(code)
+            if confidence < 1.0 or (code and code in ingredient.lower()):
+                # The label's own token: a guess, or one naming the code ("preservatives e211")
+                found_ingredients.add(normalize_ingredient(ingredient))
+            if confidence < 1.0:
+                # A guess: say what was read so it can be checked against the label
+                name = f"{name} (guessed from '{ingredient}', {confidence:.0%} confidence)"
             
             # Check limits if available
-            limit = match.get('max_permitted')
-            category = match.get('category', '')
+            limit = additive_limit(match, category)
+            kind = additive_kind(match)
             
-            # Extract quantity if present
-            qty_match = re.search(
-                rf"{name}.*?(\d+(\.\d+)?)\s*(mg/kg|g/kg|%)", 
-                ingredients_text, 
-                re.I
-            )
+            # Quantity declared next to this additive on the label
+            qty_val = quantities.get(id(match))
             
-            if qty_match:
-                qty_val = float(qty_match.group(1))
-                unit = qty_match.group(3).lower()
-                
-                # Convert to mg/kg
-                if unit == 'g/kg': 
-                    qty_val *= 1000
-                elif unit == '%': 
-                    qty_val *= 10000
-                
+            if qty_val is not None:
                 if limit and qty_val > float(limit):
                     score -= 15
                     cons.append(f"{name} exceeds limit ({qty_val}>{limit} mg/kg)")
                 else:
                     pros.append(f"{name} within safe limits")
             
-            # Add category-based insights
-            if category:
-                if category.lower() in ['preservative', 'artificial color']:
-                    cons.append(f"Contains {category.lower()}: {name}")
-                elif category.lower() in ['vitamin', 'mineral', 'fiber']:
-                    pros.append(f"Contains {category.lower()}: {name}")
+            # Add class-based insights
+            if kind in ('preservative', 'artificial color'):
+                cons.append(f"Contains {kind}: {name}")
+            elif kind:
+                pros.append(f"Contains {kind}: {name}")
     
     # Track missing ingredients
     missing = [ing for ing in ingredients if normalize_ingredient(ing) not in found_ingredients]
     
+    return score, pros, cons, missing
+
+@traced("scoring.evaluate_product")
+def evaluate_product(nutrients, ingredients_text, category=None):
+    """Evaluate product health score based on nutrients and ingredients.
+
+    category (e.g. "dried fruits") selects the FSSAI additive limits for that
+    food category; without it the most permissive limit applies.
+    """
+    score = 100
+    delta, pros, cons, missing = _score_ingredients(ingredients_text, category)
+    score += delta
+    
     # Nutrient scoring
-    for key, rule in NUTRIENT_LIMITS.items():
+    for key, rule in reference_data("NUTRIENT_LIMITS").items():
         val = nutrients.get(key)
         if val is None:
             continue
@@ -162,3 +379,105 @@ def evaluate_product(nutrients, ingredients_text):
             pros.append(f"Low {key} ({val}{rule.get('unit','')})")
 
     return max(0, min(100, score)), pros, cons, missing
+
+def nutrient_rule_arrays(limits=None):
+    """Encode NUTRIENT_LIMITS as column arrays (NaN where a rule has no bound)"""
+    import numpy as np
+    limits = reference_data("NUTRIENT_LIMITS") if limits is None else limits
+    keys = list(limits)
+    rules = [limits[key] for key in keys]
+    weights = [rule.get("penalty", 10) for rule in rules] + [rule.get("bonus", 5) for rule in rules]
+    # Keep integer weights integral so batch scores equal evaluate_product's
+    weight_type = int if all(isinstance(w, int) for w in weights) else float
+    return {
+        "keys": keys,
+        "max": np.array([rule.get("max", np.nan) for rule in rules], dtype=float),
+        "penalty": np.array([rule.get("penalty", 10) for rule in rules], dtype=weight_type),
+        "min": np.array([rule.get("min", np.nan) for rule in rules], dtype=float),
+        "bonus": np.array([rule.get("bonus", 5) for rule in rules], dtype=weight_type),
+        "unit": [rule.get("unit", "") for rule in rules],
+    }
+
+def score_nutrient_matrix(matrix, rules):
+    """Vectorized nutrient checks: (score deltas, over-max mask, under-min mask)"""
+    import numpy as np
+    # NaN compares False, so missing nutrients and absent bounds drop out
+    with np.errstate(invalid="ignore"):
+        over = matrix > rules["max"]
+        under = matrix < rules["min"]
+    deltas = under @ rules["bonus"] - over @ rules["penalty"]
+    return deltas, over, under
+
+def _nutrient_frame(products, keys):
+    """Collect (nutrient matrix, ingredient texts, food categories, index) from products"""
+    import numpy as np
+    import pandas as pd
+    if isinstance(products, pd.DataFrame):
+        index = products.index
+        if "nutrients" in products.columns:
+            values = pd.DataFrame.from_records(
+                [n if isinstance(n, dict) else {} for n in products["nutrients"]], columns=keys
+            )
+        else:
+            values = products.reindex(columns=keys)
+        if "ingredients_text" in products.columns:
+            texts = products["ingredients_text"].fillna("").tolist()
+        else:
+            texts = [""] * len(products)
+        if "category" in products.columns:
+            categories = products["category"].where(products["category"].notna(), None).tolist()
+        else:
+            categories = [None] * len(products)
+    else:
+        products = list(products)
+        index = None
+        values = pd.DataFrame.from_records(
+            [p.get("nutrients") or {} for p in products], columns=keys
+        )
+        texts = [p.get("ingredients_text") or "" for p in products]
+        categories = [p.get("category") for p in products]
+    matrix = values.to_numpy(dtype=float, na_value=np.nan)
+    return matrix, texts, categories, index
+
+@traced("scoring.evaluate_products")
+def evaluate_products(products):
+    """Score many products at once with vectorized nutrient checks.
+
+    Accepts a DataFrame (nutrient columns or a ``nutrients`` column plus
+    ``ingredients_text``) or an iterable of product dicts as returned by
+    ``lookup_product_by_barcode``, with an optional ``category`` column or
+    key for category-specific additive limits. Results match ``evaluate_product``:
+    a DataFrame with score/pros/cons/missing columns for DataFrame input,
+    otherwise a list of (score, pros, cons, missing) tuples.
+    """
+    import numpy as np
+    import pandas as pd
+    rules = nutrient_rule_arrays()
+    matrix, texts, categories, index = _nutrient_frame(products, rules["keys"])
+    deltas, over, under = score_nutrient_matrix(matrix, rules)
+    scores = (100 + deltas).tolist()
+
+    results = []
+    for text, category in zip(texts, categories):
+        if text:
+            results.append(list(_score_ingredients(text, category)))
+        else:
+            results.append([0, [], [], []])
+
+    # Messages only for flagged cells. Walking rules in order (max before
+    # min) keeps each product's pros/cons in evaluate_product's order.
+    for col, (key, unit) in enumerate(zip(rules["keys"], rules["unit"])):
+        for flags, label, slot in ((over, "High", 2), (under, "Low", 1)):
+            rows = np.flatnonzero(flags[:, col])
+            if not len(rows):
+                continue
+            for row, val in zip(rows.tolist(), matrix[rows, col].tolist()):
+                results[row][slot].append(f"{label} {key} ({val}{unit})")
+
+    final = [
+        (max(0, min(100, score + delta)), pros, cons, missing)
+        for score, (delta, pros, cons, missing) in zip(scores, results)
+    ]
+    if index is None:
+        return final
+    return pd.DataFrame(final, index=index, columns=["score", "pros", "cons", "missing"])
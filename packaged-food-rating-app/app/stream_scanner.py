@@ -0,0 +1,189 @@
+"""Continuous barcode scanning over a stream of frames.
+
+Frames come from any iterator (a video file, a webcam or a list of
+images). Decoding runs on a background worker; frames that arrive while
+it is busy are dropped, and blurry or near-duplicate frames are skipped
+with cheap checks on a thumbnail. A code is reported once it has been
+decoded in `confirmations` frames.
+
+    python stream_scanner.py recording.mp4 --confirmations 2
+    python stream_scanner.py 0 --realtime          # webcam device 0
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from frame import as_frame
+
+STREAM_CONFIRMATIONS = int(os.getenv("STREAM_CONFIRMATIONS", 2))
+# Laplacian variance of the thumbnail below which a frame is too blurry to decode
+STREAM_MIN_SHARPNESS = float(os.getenv("STREAM_MIN_SHARPNESS", 40))
+# Mean absolute thumbnail difference (grey levels) below which frames count as duplicates
+STREAM_DUPLICATE_DIFF = float(os.getenv("STREAM_DUPLICATE_DIFF", 3))
+# Thumbnail widths for the sharpness check and the duplicate comparison
+SHARPNESS_WIDTH = 320
+THUMB_WIDTH = 96
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def iter_video(source, realtime=False):
+    """Yield BGR frames from a video file or webcam index.
+
+    With realtime=True a file is paced at its native frame rate, so the
+    scanner drops frames the way it would on a live camera.
+    """
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else str(source))
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video source {source!r}")
+    interval = 1.0 / (capture.get(cv2.CAP_PROP_FPS) or 30)
+    next_at = time.perf_counter()
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            if realtime:
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield frame
+    finally:
+        capture.release()
+
+
+def iter_images(paths):
+    """Yield encoded image bytes from files, in order"""
+    for path in paths:
+        with open(path, "rb") as f:
+            yield f.read()
+
+
+def sharpness(thumb):
+    """Variance of the Laplacian: low for blurred or featureless frames"""
+    return cv2.Laplacian(thumb, cv2.CV_64F).var()
+
+
+class StreamScanner:
+    """Scan a frame iterator and yield each distinct barcode once confirmed.
+
+    decode defaults to vision_handler.decode_barcode and is called with a
+    Frame, so its grayscale image is shared with the thumbnail checks.
+    With drop_frames=False every frame that passes the checks is decoded
+    (useful for reproducible offline runs).
+    """
+
+    def __init__(self, decode=None, confirmations=STREAM_CONFIRMATIONS, min_sharpness=STREAM_MIN_SHARPNESS,
+                 duplicate_diff=STREAM_DUPLICATE_DIFF, drop_frames=True):
+        if decode is None:
+            from vision_handler import decode_barcode
+            decode = decode_barcode
+        self.decode = decode
+        self.confirmations = confirmations
+        self.min_sharpness = min_sharpness
+        self.duplicate_diff = duplicate_diff
+        self.drop_frames = drop_frames
+        self.stats = {}
+
+    def scan(self, frames):
+        """Generator of confirmed barcodes: {data, type, method, frame, seconds}"""
+        self.stats = {"frames": 0, "decoded": 0, "dropped": 0, "blurry": 0, "duplicates": 0,
+                      "seconds": 0.0, "fps": 0.0, "decode_fps": 0.0,
+                      "time_to_first_decode": None, "time_to_first_confirmed": None}
+        counts = {}
+        confirmed = set()
+        # Thumbnail of the last decoded frame and whether its decode could still change anything
+        last_thumb, last_useful = None, True
+        start = time.perf_counter()
+        pending = None
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-decode") as worker:
+            for index, image in enumerate(frames):
+                self.stats["frames"] += 1
+                if pending is not None and pending.done():
+                    yield from self._collect(pending, counts, confirmed, start)
+                    last_useful = self._still_useful(pending, confirmed)
+                    pending = None
+                if pending is not None:
+                    if self.drop_frames:
+                        self.stats["dropped"] += 1
+                        continue
+                    yield from self._collect(pending, counts, confirmed, start)
+                    last_useful = self._still_useful(pending, confirmed)
+                    pending = None
+
+                frame = as_frame(image)
+                width = frame.gray.shape[1]
+                if sharpness(frame.gray_at_width(min(SHARPNESS_WIDTH, width))) < self.min_sharpness:
+                    self.stats["blurry"] += 1
+                    continue
+                # Same view as the last decode, which can no longer add anything
+                thumb = frame.gray_at_width(min(THUMB_WIDTH, width))
+                if (last_thumb is not None and not last_useful and last_thumb.shape == thumb.shape
+                        and cv2.absdiff(thumb, last_thumb).mean() < self.duplicate_diff):
+                    self.stats["duplicates"] += 1
+                    continue
+
+                last_thumb = thumb
+                pending = worker.submit(self._decode, frame, index)
+
+            if pending is not None:
+                yield from self._collect(pending, counts, confirmed, start)
+
+        self.stats["seconds"] = time.perf_counter() - start
+        if self.stats["seconds"]:
+            self.stats["fps"] = self.stats["frames"] / self.stats["seconds"]
+            self.stats["decode_fps"] = self.stats["decoded"] / self.stats["seconds"]
+
+    def _decode(self, frame, index):
+        return index, self.decode(frame)
+
+    def _collect(self, future, counts, confirmed, start):
+        index, barcodes = future.result()
+        self.stats["decoded"] += 1
+        now = time.perf_counter() - start
+        if barcodes and self.stats["time_to_first_decode"] is None:
+            self.stats["time_to_first_decode"] = now
+        for barcode in barcodes:
+            key = (barcode["type"], barcode["data"])
+            counts[key] = counts.get(key, 0) + 1
+            if key in confirmed or counts[key] < self.confirmations:
+                continue
+            confirmed.add(key)
+            if self.stats["time_to_first_confirmed"] is None:
+                self.stats["time_to_first_confirmed"] = now
+            yield {"data": barcode["data"], "type": barcode["type"], "method": barcode.get("method"),
+                   "frame": index, "seconds": round(now, 3)}
+
+    def _still_useful(self, future, confirmed):
+        """Decoding this view again only helps if it found an unconfirmed code"""
+        _, barcodes = future.result()
+        return any((b["type"], b["data"]) not in confirmed for b in barcodes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan barcodes from a video, webcam or image sequence")
+    parser.add_argument("sources", nargs="+", help="video file, webcam index, or image files")
+    parser.add_argument("--confirmations", type=int, default=STREAM_CONFIRMATIONS)
+    parser.add_argument("--realtime", action="store_true", help="pace video files at their frame rate")
+    parser.add_argument("--no-drop", action="store_true", help="decode every frame instead of dropping")
+    args = parser.parse_args(argv)
+
+    if all(os.path.splitext(s)[1].lower() in IMAGE_SUFFIXES for s in args.sources):
+        frames = iter_images(args.sources)
+    else:
+        frames = iter_video(args.sources[0], realtime=args.realtime)
+
+    scanner = StreamScanner(confirmations=args.confirmations, drop_frames=not args.no_drop)
+    for barcode in scanner.scan(frames):
+        print(json.dumps(barcode), flush=True)
+    print(json.dumps({key: round(value, 3) if isinstance(value, float) else value
+                      for key, value in scanner.stats.items()}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Lightweight stage tracing: spans, counters and slow-request profiles.
+
+Off by default (set TRACING=1 or call enable()). When disabled, span()
+returns a shared no-op context manager and traced functions cost one
+flag check. When enabled:
+
+- every span feeds a per-stage latency histogram and, inside a request,
+  that request's trace;
+- finished requests are logged as one JSON line on the
+  "food_analyzer.trace" logger;
+- render_prometheus() returns the histograms and counters in the
+  Prometheus text format (served at /metrics by pipeline.py);
+- with TRACE_PROFILE_SLOW_MS set, requests are run under cProfile and the
+  profile is written to TRACE_PROFILE_DIR when they cross the threshold.
+  Only one request per process is profiled at a time (Python 3.12+ allows
+  a single active profiler); concurrent requests are traced unprofiled.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+TRACING = os.getenv("TRACING", "0") == "1"
+TRACE_PROFILE_SLOW_MS = float(os.getenv("TRACE_PROFILE_SLOW_MS", 0))
+TRACE_PROFILE_DIR = os.getenv("TRACE_PROFILE_DIR", "profiles")
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("food_analyzer.trace")
+
+_enabled = TRACING
+_local = threading.local()
+_lock = threading.Lock()
+# Stage name -> [count, total seconds, per-bucket counts]
+_stages = {}
+_counters = {}
+# Held by the request that owns the process's one profiler
+_profiler_lock = threading.Lock()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def reset():
+    """Drop all collected histograms and counters"""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def _observe(name, seconds):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            stage = _stages[name] = [0, 0.0, [0] * len(BUCKETS)]
+        stage[0] += 1
+        stage[1] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stage[2][i] += 1
+                break
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "seconds", "depth", "_trace")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.seconds = 0.0
+        self.depth = 0
+
+    def __enter__(self):
+        self._trace = getattr(_local, "trace", None)
+        # Nesting is tracked per thread, so spans from worker threads attached
+        # to the same trace keep their own depth
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        _local.depth = self.depth
+        if self._trace is not None:
+            self._trace.spans.append(self)
+        _observe(self.name, self.seconds)
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes (e.g. hit/miss) to the span's log entry"""
+        self.attrs.update(attrs)
+
+
+def span(name, **attrs):
+    """Context manager timing one stage; a shared no-op when tracing is off"""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Increment an event counter"""
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+class Trace:
+    """Spans recorded on one thread between start_request and finish_request"""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.seconds = 0.0
+        self.profile_path = None
+        self._start = time.perf_counter()
+        self._parent = None
+        self._profiler = None
+
+    def rows(self):
+        """Spans in start order as {stage, ms, depth} dicts, for tables and logs"""
+        return [
+            {"stage": s.name, "ms": round(s.seconds * 1000, 2), "depth": s.depth, **s.attrs}
+            for s in sorted(self.spans, key=lambda s: s.start)
+        ]
+
+    def to_dict(self):
+        return {"trace": self.name, "ms": round(self.seconds * 1000, 2), **self.attrs,
+                "spans": self.rows(), "profile": self.profile_path}
+
+
+def start_request(name, root=False, **attrs):
+    """Begin collecting this thread's spans into a Trace (None when tracing is off).
+
+    root=True drops any trace left unfinished on this thread, e.g. by a
+    Streamlit rerun that interrupted the previous script run.
+    """
+    if not _enabled:
+        return None
+    trace = Trace(name, attrs)
+    if root:
+        # An abandoned trace must not keep the profiler
+        abandoned = getattr(_local, "trace", None)
+        while abandoned is not None:
+            _stop_profiler(abandoned)
+            abandoned = abandoned._parent
+    trace._parent = None if root else getattr(_local, "trace", None)
+    _local.trace = trace
+    # Only the outermost request on a thread can own the profiler, and only
+    # one request at a time; the others go unprofiled rather than wait
+    if TRACE_PROFILE_SLOW_MS > 0 and trace._parent is None and _profiler_lock.acquire(blocking=False):
+        import cProfile
+        try:
+            trace._profiler = cProfile.Profile()
+            trace._profiler.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, an outer cProfile) is active
+            trace._profiler = None
+            _profiler_lock.release()
+    return trace
+
+
+def _stop_profiler(trace):
+    """Disable trace's profiler and free the slot; True if it had one"""
+    if trace._profiler is None:
+        return False
+    trace._profiler.disable()
+    trace._profiler = None
+    _profiler_lock.release()
+    return True
+
+
+def finish_request(trace):
+    """Close a trace: record it, log it and keep its profile if it was slow"""
+    if trace is None:
+        return None
+    trace.seconds = time.perf_counter() - trace._start
+    _local.trace = trace._parent
+    profiler = trace._profiler
+    if _stop_profiler(trace):
+        if trace.seconds * 1000 >= TRACE_PROFILE_SLOW_MS:
+            os.makedirs(TRACE_PROFILE_DIR, exist_ok=True)
+            trace.profile_path = os.path.join(
+                TRACE_PROFILE_DIR, f"{trace.name}-{time.strftime('%Y%m%d-%H%M%S')}-{id(trace):x}.prof"
+            )
+            profiler.dump_stats(trace.profile_path)
+            count("slow_requests")
+    _observe("request." + trace.name, trace.seconds)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(trace.to_dict(), default=str))
+    return trace
+
+
+class request:
+    """with request("name") as trace: ... (trace is None when tracing is off)"""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace = None
+
+    def __enter__(self):
+        self.trace = start_request(self.name, **self.attrs)
+        return self.trace
+
+    def __exit__(self, *exc):
+        finish_request(self.trace)
+        return False
+
+
+def current():
+    """This thread's open trace, to hand to worker threads via attach()"""
+    return getattr(_local, "trace", None)
+
+
+class attach:
+    """with attach(trace): record this thread's spans into another thread's trace"""
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_local, "trace", None)
+        if self.trace is not None:
+            _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc):
+        _local.trace = self._previous
+        return False
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus():
+    """Stage histograms and event counters in the Prometheus text format"""
+    with _lock:
+        stages = {name: (n, total, list(buckets)) for name, (n, total, buckets) in _stages.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP food_analyzer_stage_seconds Time spent in each pipeline stage",
+        "# TYPE food_analyzer_stage_seconds histogram",
+    ]
+    for name in sorted(stages):
+        n, total, buckets = stages[name]
+        stage = _label(name)
+        cumulative = 0
+        for bound, hits in zip(BUCKETS, buckets):
+            cumulative += hits
+            lines.append(f'food_analyzer_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'food_analyzer_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {n}')
+        lines.append(f'food_analyzer_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'food_analyzer_stage_seconds_count{{stage="{stage}"}} {n}')
+
+    lines += [
+        "# HELP food_analyzer_events_total Pipeline event counters",
+        "# TYPE food_analyzer_events_total counter",
+    ]
+    for name in sorted(counters):
+        lines.append(f'food_analyzer_events_total{{event="{_label(name)}"}} {counters[name]}')
+    return "\n".join(lines) + "\n"
@@ -1,142 +1,491 @@
+import re
+import threading
+import time
 import cv2
-import numpy as np
 from pyzbar import pyzbar
-import pytesseract
-from PIL import Image
 import imutils
+import ocr_backend
+import tracing
+from tracing import traced
+from frame import as_frame
+from scoring import reference_data
 
-def decode_barcode(image):
-    """Detect and decode barcodes/QR codes in image with enhanced preprocessing"""
-    # Convert to OpenCV format if PIL Image
-    if isinstance(image, Image.Image):
-        image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    
-    # Resize image while maintaining aspect ratio
-    height, width = image.shape[:2]
-    target_width = 1000
-    ratio = target_width / width
-    dim = (target_width, int(height * ratio))
-    image = cv2.resize(image, dim)
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # Enhanced preprocessing pipeline
-    # 1. Noise reduction
-    denoised = cv2.fastNlMeansDenoising(gray)
-    
-    # 2. Increase contrast
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    contrasted = clahe.apply(denoised)
-    
-    # 3. Thresholding
-    thresh = cv2.threshold(contrasted, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-    
-    # 4. Morphological operations
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
-    morphed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-    
-    # Try different image processing combinations
-    images_to_try = [
-        ("original", gray),
-        ("denoised", denoised),
-        ("contrasted", contrasted),
-        ("threshold", thresh),
-        ("morphed", morphed)
-    ]
-    
+# Barcode preprocessing variants: name -> (input variant, transform).
+# Each is built lazily from its input, so unused variants cost nothing.
+VARIANT_BUILDERS = {
+    "original": (None, lambda gray: gray),
+    "contrasted": ("original", lambda img: cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8)).apply(img)),
+    "threshold": ("contrasted", lambda img: cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
+    "morphed": ("threshold", lambda img: cv2.morphologyEx(
+        img, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (3,3)))),
+    # Non-local means denoising is by far the most expensive step, so it runs last
+    "denoised": ("original", cv2.fastNlMeansDenoising),
+}
+
+# Crops are decoded at up to this width; the full-frame fallback uses 1000 px
+REGION_MAX_WIDTH = 640
+
+# Default cascade order, cheapest first
+DECODE_STAGES = ["original", "contrasted", "threshold", "morphed", "denoised"]
+
+# Cumulative per-stage counters across calls: runs, hits and seconds spent.
+# Decodes run concurrently (speculative stages, HTTP workers, app sessions).
+DECODE_STAGE_STATS = {name: {"runs": 0, "hits": 0, "seconds": 0.0} for name in VARIANT_BUILDERS}
+_stats_lock = threading.Lock()
+
+def _build_variant(name, gray, variants):
+    """Build a preprocessing variant (and its inputs) once per image"""
+    if name not in variants:
+        source, transform = VARIANT_BUILDERS[name]
+        base = gray if source is None else _build_variant(source, gray, variants)
+        variants[name] = transform(base)
+    return variants[name]
+
+def decode_stage_stats():
+    """Per-stage hit rate and mean time, to see which stages pay off"""
+    with _stats_lock:
+        return {
+            name: {**stats, "hit_rate": stats["hits"] / stats["runs"] if stats["runs"] else 0.0}
+            for name, stats in DECODE_STAGE_STATS.items()
+        }
+
+@traced("vision.locate_regions")
+def locate_barcode_regions(image, max_regions=3, work_width=500, padding=0.15):
+    """Find likely barcode regions with Scharr gradients and morphology.
+
+    Runs on a downscaled pyramid level and returns up to max_regions boxes
+    as (x, y, w, h) in the full grayscale image's coordinates, largest first.
+    """
+    frame = as_frame(image)
+    height, width = frame.gray.shape[:2]
+    small = frame.gray_at_width(min(width, work_width))
+    scale = small.shape[1] / width
+
+    grad_x = cv2.convertScaleAbs(cv2.Scharr(small, cv2.CV_32F, 1, 0))
+    grad_y = cv2.convertScaleAbs(cv2.Scharr(small, cv2.CV_32F, 0, 1))
+
+    boxes = []
+    # Bars are strong along one axis and flat along the other: try both orientations
+    for gradient, kernel_size in ((cv2.subtract(grad_x, grad_y), (21, 7)), (cv2.subtract(grad_y, grad_x), (7, 21))):
+        blurred = cv2.blur(gradient, (9, 9))
+        thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size)
+        closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+        closed = cv2.dilate(cv2.erode(closed, None, iterations=4), None, iterations=4)
+
+        contours = imutils.grab_contours(
+            cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        )
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            # Ignore specks and regions covering most of the frame
+            if w * h < 0.005 * small.size or w * h > 0.9 * small.size:
+                continue
+            boxes.append((w * h, x, y, w, h))
+
+    regions = []
+    for _, x, y, w, h in sorted(boxes, reverse=True)[:max_regions]:
+        pad_x, pad_y = int(w * padding), int(h * padding)
+        x1 = max(0, int((x - pad_x) / scale))
+        y1 = max(0, int((y - pad_y) / scale))
+        x2 = min(width, int((x + w + pad_x) / scale))
+        y2 = min(height, int((y + h + pad_y) / scale))
+        regions.append((x1, y1, x2 - x1, y2 - y1))
+    return regions
+
+def _fit_width(gray, max_width):
+    """Downscale (never upscale) to at most max_width pixels wide"""
+    height, width = gray.shape[:2]
+    if width <= max_width:
+        return gray
+    ratio = max_width / width
+    return cv2.resize(gray, (max_width, int(height * ratio)), interpolation=cv2.INTER_AREA)
+
+def _decode_cascade(gray, stages, max_codes, timings, results, seen, region=None):
+    """Run the preprocessing cascade on one image; True once max_codes are found"""
+    label = "full" if region is None else "region"
+    variants = {}
+    for name in stages:
+        # Stage time covers building the variant plus the pyzbar pass
+        start = time.perf_counter()
+        with tracing.span("vision.decode." + name):
+            img = _build_variant(name, gray, variants)
+            barcodes = pyzbar.decode(img)
+        elapsed = time.perf_counter() - start
+        key = f"{label}:{name}"
+        timings[key] = timings.get(key, 0.0) + elapsed
+
+        with _stats_lock:
+            stats = DECODE_STAGE_STATS[name]
+            stats["runs"] += 1
+            stats["seconds"] += elapsed
+            if barcodes:
+                stats["hits"] += 1
+
+        for barcode in barcodes:
+            data = barcode.data.decode("utf-8")
+            type = barcode.type
+            if (type, data) in seen:
+                continue
+            seen.add((type, data))
+            results.append({
+                "data": data,
+                "type": type,
+                "method": name,
+                "region": region
+            })
+        if max_codes and len(results) >= max_codes:
+            return True
+    return False
+
+@traced("vision.decode_barcode")
+def decode_barcode(image, max_codes=1, stages=None, timings=None, regions=None):
+    """Detect and decode barcodes/QR codes with a cost-ordered preprocessing cascade.
+
+    Candidate barcode regions are located first and decoded as small
+    crops; the full frame is only processed if none of them decode.
+    Pass regions to reuse boxes from locate_barcode_regions. Variants are
+    tried cheapest first and each is only computed if the previous ones
+    failed. Decoding stops once max_codes unique codes are found (None
+    tries everything). Results are deduplicated by (type, data) and carry
+    the region they were found in (None for the full frame). Pass a dict
+    as timings to receive per-stage seconds for this call. Pass a Frame to
+    share its decoded image and pyramid with the other vision functions.
+    """
+    frame = as_frame(image)
+    gray = frame.gray
+    stages = stages or DECODE_STAGES
+    timings = {} if timings is None else timings
     results = []
-    for name, img in images_to_try:
-        barcodes = pyzbar.decode(img)
-        if barcodes:
-            for barcode in barcodes:
-                data = barcode.data.decode("utf-8")
-                type = barcode.type
-                results.append({
-                    "data": data,
-                    "type": type,
-                    "method": name
-                })
-    
+    seen = set()
+
+    start = time.perf_counter()
+    if regions is None:
+        regions = locate_barcode_regions(frame)
+    timings["localize"] = time.perf_counter() - start
+
+    for region in regions:
+        x, y, w, h = region
+        # Crops are views into the cached grayscale image
+        crop = _fit_width(gray[y:y + h, x:x + w], REGION_MAX_WIDTH)
+        if _decode_cascade(crop, stages, max_codes, timings, results, seen, region):
+            return results
+    if results:
+        return results
+
+    # Fall back to the whole frame at 1000 px wide (the pyramid level OCR also uses)
+    _decode_cascade(frame.gray_at_width(1000), stages, max_codes, timings, results, seen)
     return results
 
-def extract_text_from_image(image_file, preprocess=True):
-    """Enhanced text extraction with preprocessing"""
-    # Handle different input types
-    if isinstance(image_file, Image.Image):
-        image = cv2.cvtColor(np.array(image_file), cv2.COLOR_RGB2BGR)
-    elif isinstance(image_file, np.ndarray):
-        image = image_file
-    else:
-        # Handle file-like objects (e.g., StreamingUploadedFile)
-        image_data = np.frombuffer(image_file.getvalue(), np.uint8)
-        image = cv2.imdecode(image_data, cv2.IMREAD_COLOR)
+# Section headers that open / close the ingredients block on a label
+INGREDIENT_HEADERS = ("ingredients", "ingredient", "ingredients:", "ingredient:")
+SECTION_HEADERS = ("nutrition", "nutritional", "allergen", "allergens", "allergy", "contains:",
+                   "storage", "best", "manufactured", "marketed", "net", "mrp", "directions")
+
+@traced("vision.preprocess_ocr")
+def preprocess_for_ocr(image):
+    """Resize, denoise, binarize and dilate an image for Tesseract"""
+    # 1000 px wide grayscale, shared with the barcode full-frame fallback
+    gray = as_frame(image).gray_at_width(1000)
     
-    if preprocess:
-        # Resize while maintaining aspect ratio
-        image = imutils.resize(image, width=1000)
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Denoise
+    # Denoise
+    with tracing.span("vision.denoise"):
         denoised = cv2.fastNlMeansDenoising(gray)
-        
-        # Thresholding to handle different lighting conditions
-        thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        
-        # Dilation to enhance text
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
-        dilated = cv2.dilate(thresh, kernel, iterations=1)
-        
-        # Convert to PIL Image for Tesseract
-        pil_image = Image.fromarray(dilated)
-    else:
-        pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
     
-    # Extract text
-    text = pytesseract.image_to_string(pil_image)
+    # Thresholding to handle different lighting conditions
+    thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
     
-    return text.strip()
-
-def detect_ingredients_section(image):
-    """Detect and extract the ingredients section from product packaging"""
-    # Convert to OpenCV format if needed
-    if isinstance(image, Image.Image):
-        image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    elif isinstance(image, np.ndarray):
-        image = image.copy()
+    # Dilation to enhance text
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
+    return cv2.dilate(thresh, kernel, iterations=1)
+
+@traced("vision.ocr_layout")
+def ocr_layout(image_file, preprocess=True):
+    """Run Tesseract once and return word boxes grouped into lines, plus the full text.
+
+    Returns {"lines": [...], "text": str}. Each line is a dict with its
+    (block, par, line) key, bounding box and "words" list of
+    {text, left, top, width, height, conf}.
+    """
+    frame = as_frame(image_file)
+    if preprocess:
+        ocr_image = preprocess_for_ocr(frame)
     else:
-        # Handle file-like objects
-        image_data = np.frombuffer(image.getvalue(), np.uint8)
-        image = cv2.imdecode(image_data, cv2.IMREAD_COLOR)
+        ocr_image = cv2.cvtColor(frame.bgr, cv2.COLOR_BGR2RGB)
     
-    # Create a copy for visualization
-    output = image.copy()
+    with tracing.span("ocr.image_to_data"):
+        data = ocr_backend.image_to_data(ocr_image)
     
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    lines = {}
+    for i, text in enumerate(data["text"]):
+        text = text.strip()
+        if not text:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        line = lines.setdefault(key, {"key": key, "words": []})
+        line["words"].append({
+            "text": text,
+            "left": data["left"][i],
+            "top": data["top"][i],
+            "width": data["width"][i],
+            "height": data["height"][i],
+            "conf": float(data["conf"][i]),
+        })
     
-    # Apply OCR to detect text regions
-    results = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT)
+    ordered = [lines[key] for key in sorted(lines)]
+    for line in ordered:
+        words = line["words"]
+        line["text"] = " ".join(word["text"] for word in words)
+        line["left"] = min(word["left"] for word in words)
+        line["top"] = min(word["top"] for word in words)
+        line["right"] = max(word["left"] + word["width"] for word in words)
+        line["bottom"] = max(word["top"] + word["height"] for word in words)
     
-    ingredients_box = None
-    for i in range(len(results["text"])):
-        text = results["text"][i].lower().strip()
-        # Look for common ingredients section headers
-        if text in ["ingredients", "ingredients:", "ingredients list"]:
-            x = results["left"][i]
-            y = results["top"][i]
-            w = results["width"][i]
-            h = results["height"][i]
-            # Expand box to include ingredients list
-            ingredients_box = (x, y, x + w, y + h * 5)  # Assume ingredients take up 5x header height
-            break
+    return {"lines": ordered, "text": _join_lines(ordered)}
+
+def _join_lines(lines):
+    """Rebuild plain text: newline between lines, blank line between paragraphs"""
+    parts = []
+    previous = None
+    for line in lines:
+        if previous is not None:
+            parts.append("\n\n" if line["key"][:2] != previous[:2] else "\n")
+        parts.append(line["text"])
+        previous = line["key"]
+    return "".join(parts).strip()
+
+def extract_text_from_image(image_file, preprocess=True, layout=None):
+    """Enhanced text extraction with preprocessing (reuses layout if given)"""
+    if layout is None:
+        layout = ocr_layout(image_file, preprocess=preprocess)
+    return layout["text"]
+
+@traced("vision.detect_ingredients")
+def detect_ingredients_section(image, layout=None):
+    """Detect and extract the ingredients section from product packaging.
+
+    Uses the word boxes of a single OCR pass (pass layout from ocr_layout
+    to share it with the full-text fallback). The section runs from the
+    "Ingredients" header to the end of its paragraph, continuing into the
+    next paragraph when the header sits alone, and stops at the next
+    section header.
+    """
+    if layout is None:
+        layout = ocr_layout(image)
+    lines = layout["lines"]
     
-    if ingredients_box:
-        # Extract and process ingredients section
-        x1, y1, x2, y2 = ingredients_box
-        ingredients_image = image[y1:y2, x1:x2]
-        return extract_text_from_image(ingredients_image)
+    for index, line in enumerate(lines):
+        words = [word["text"].lower() for word in line["words"]]
+        header_at = next((i for i, word in enumerate(words) if word.strip(":-") in INGREDIENT_HEADERS), None)
+        if header_at is None:
+            continue
+        
+        # Rest of the header line, e.g. "Ingredients: sugar, salt"
+        collected = [" ".join(w["text"] for w in line["words"][header_at + 1:])]
+        paragraph = line["key"][:2]
+        header_alone = not collected[0]
+        for following in lines[index + 1:]:
+            first = following["words"][0]["text"].lower()
+            if first in SECTION_HEADERS or first.rstrip(":") in SECTION_HEADERS:
+                break
+            if following["key"][:2] != paragraph:
+                if not header_alone:
+                    break
+                # Header on its own line: the list is the next paragraph
+                paragraph = following["key"][:2]
+                header_alone = False
+            collected.append(following["text"])
+        
+        text = " ".join(part for part in collected if part).strip(" :-")
+        if text:
+            return text
     
-    return None
\ No newline at end of file
+    return None
+
+# Nutrition tables are located on a pyramid level at most this wide; row
+# crops are upscaled so single text lines are about TABLE_ROW_HEIGHT px tall
+TABLE_WORK_WIDTH = 1200
+TABLE_ROW_HEIGHT = 56
+
+# Label row name -> OpenFoodFacts key; first match wins, so specific names come first
+NUTRITION_ROWS = [
+    ("energy-kcal_100g", re.compile(r"calorie|energy|kcal")),
+    ("saturated-fat_100g", re.compile(r"saturate")),
+    ("trans-fat_100g", re.compile(r"trans")),
+    ("fat_100g", re.compile(r"fat")),
+    ("cholesterol_100g", re.compile(r"cholesterol")),
+    ("sodium_100g", re.compile(r"sodium")),
+    ("salt_100g", re.compile(r"salt")),
+    ("fiber_100g", re.compile(r"fib(?:er|re)")),
+    ("sugars_100g", re.compile(r"sugar")),
+    ("carbohydrates_100g", re.compile(r"carbo")),
+    ("proteins_100g", re.compile(r"protein")),
+    ("potassium_100g", re.compile(r"potassium")),
+    ("calcium_100g", re.compile(r"calcium")),
+    ("iron_100g", re.compile(r"\biron\b")),
+    ("vitamin-c_100g", re.compile(r"vitamin c")),
+]
+NUTRITION_AMOUNT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(kcal|kj|cal|mcg|µg|mg|g|%)?", re.I)
+NAME_UNIT_RE = re.compile(r"\((kcal|kj|mcg|µg|mg|g)\)")
+# "Serving size 1 cup (212 g)": the first amount on the line with a g/ml unit
+SERVING_SIZE_RE = re.compile(r"serving size[^\n]*?(\d+(?:[.,]\d+)?)\s*(g|ml)\b")
+PER_100_RE = re.compile(r"per\s*100\s*(g|ml)")
+# OCR reads a zero before a unit as the letter O ("Omg")
+OCR_ZERO_RE = re.compile(r"(?<![a-z])[oO](?=\s*(?:mg|g)\b)")
+
+UNIT_GRAMS = {"g": 1.0, "mg": 1e-3, "mcg": 1e-6, "µg": 1e-6}
+UNIT_KCAL = {"kcal": 1.0, "cal": 1.0, "kj": 1 / 4.184}
+
+@traced("vision.table_rows")
+def locate_table_rows(image, min_lines=3):
+    """Find nutrition-table rows between horizontal rule lines.
+
+    Returns row boxes (x, y, w, h) in full grayscale coordinates, top to
+    bottom, or [] when fewer than min_lines rules are found.
+    """
+    frame = as_frame(image)
+    height, width = frame.gray.shape[:2]
+    small = frame.gray_at_width(min(width, TABLE_WORK_WIDTH))
+    scale = small.shape[1] / width
+    h, w = small.shape[:2]
+
+    binary = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    # Rules are long and flat: opening with a wide 1 px kernel keeps only them
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(w // 4, 1), 1))
+    rules = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(rules)
+    # Thin rules and thick bars, but not dark background blocks
+    lines = sorted((y, y + lh, x, x + lw) for x, y, lw, lh, _ in stats[1:].tolist() if lh <= 0.04 * h)
+    if len(lines) < min_lines:
+        return []
+
+    widest = max(right - left for _, _, left, right in lines)
+    full = [line for line in lines if line[3] - line[2] >= 0.8 * widest]
+    # Inset so a frame around the table is not OCR'd as "|" or "l"
+    inset = max(2, int(0.012 * widest))
+    left = min(line[2] for line in full) + inset
+    right = max(line[3] for line in full) - inset
+
+    rows = []
+    for (_, top, _, _), (bottom, _, _, _) in zip(lines, lines[1:]):
+        if bottom - top >= 0.015 * h:
+            rows.append((left, top, right - left, bottom - top))
+    # Text below the last rule (e.g. a footnote) up to the card's edge
+    last = lines[-1][1]
+    if h - last >= 0.015 * h:
+        rows.append((left, last, right - left, min(h - last, max(r[3] for r in rows) if rows else h - last)))
+
+    return [
+        (int(x / scale), int(y / scale), max(1, int(rw / scale)), max(1, int(rh / scale)))
+        for x, y, rw, rh in rows
+    ]
+
+def _row_crop(gray, box, factor):
+    """Binarized, padded and upscaled crop of one table row for Tesseract"""
+    x, y, w, h = box
+    crop = gray[y:y + h, x:x + w]
+    if factor > 1.0:
+        crop = cv2.resize(crop, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+    crop = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    return cv2.copyMakeBorder(crop, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=255)
+
+def _data_lines(data):
+    """Text lines of one image_to_data result"""
+    lines = {}
+    for i, text in enumerate(data["text"]):
+        text = text.strip()
+        if text:
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(text)
+    return [" ".join(lines[key]) for key in sorted(lines)]
+
+def _convert(value, unit, key, units):
+    """Convert a label amount to the unit NUTRIENT_LIMITS uses for key (g or kcal otherwise)"""
+    if key == "energy-kcal_100g":
+        return value * UNIT_KCAL.get(unit or "kcal", 1.0)
+    target = units.get(key, "g")
+    grams = value * UNIT_GRAMS.get(unit or "g", 1.0)
+    return grams / UNIT_GRAMS.get(target, 1.0)
+
+def parse_nutrition_row(text):
+    """Return (key, amount, unit) for one label line, or None.
+
+    The row name is the text before the first number. Percent daily
+    values are ignored; for energy a kcal amount wins over kJ.
+    """
+    text = OCR_ZERO_RE.sub("0", text.lower())
+    first_digit = re.search(r"\d", text)
+    if first_digit is None:
+        return None
+    name = text[:first_digit.start()]
+    key = next((key for key, pattern in NUTRITION_ROWS if pattern.search(name)), None)
+    if key is None:
+        return None
+    name_unit = NAME_UNIT_RE.search(name)
+    amounts = [
+        (float(match.group(1).replace(",", ".")), (match.group(2) or "").lower() or None)
+        for match in NUTRITION_AMOUNT_RE.finditer(text, first_digit.start())
+        if (match.group(2) or "") != "%"
+    ]
+    if not amounts:
+        return None
+    if key == "energy-kcal_100g":
+        amounts.sort(key=lambda amount: amount[1] not in (None, "kcal", "cal"))
+    value, unit = amounts[0]
+    return key, value, unit or (name_unit.group(1) if name_unit else None)
+
+def parse_nutrition_lines(lines):
+    """Map label text lines to per-100 g OpenFoodFacts nutrients.
+
+    Amounts are converted to NUTRIENT_LIMITS' units and scaled from the
+    serving size unless the label says "per 100 g". Salt is derived from
+    sodium when the label only lists sodium.
+    """
+    joined = "\n".join(lines).lower()
+    serving = SERVING_SIZE_RE.search(OCR_ZERO_RE.sub("0", joined))
+    serving_size = float(serving.group(1).replace(",", ".")) if serving else None
+    per_100 = bool(PER_100_RE.search(joined)) or not serving_size
+    factor = 1.0 if per_100 else 100 / serving_size
+
+    units = {key: rule.get("unit", "g") for key, rule in reference_data("NUTRIENT_LIMITS").items()}
+    nutrients = {}
+    for line in lines:
+        row = parse_nutrition_row(line)
+        if row is not None and row[0] not in nutrients:
+            key, value, unit = row
+            nutrients[key] = round(_convert(value, unit, key, units) * factor, 4)
+    if "sodium_100g" in nutrients and "salt_100g" not in nutrients:
+        sodium_grams = nutrients["sodium_100g"] * UNIT_GRAMS.get(units.get("sodium_100g", "g"), 1.0)
+        nutrients["salt_100g"] = round(sodium_grams * 2.5 / UNIT_GRAMS.get(units.get("salt_100g", "g"), 1.0), 4)
+    return {"nutrients": nutrients, "basis": "100g" if per_100 else "serving", "serving_size": serving_size}
+
+
+@traced("vision.nutrition_facts")
+def extract_nutrition_facts(image, layout=None):
+    """Read a nutrition table into per-100 g OpenFoodFacts-style nutrients.
+
+    When the table has rule lines, each row is OCR'd as a small crop, all
+    rows in parallel through ocr_backend.map_to_data. Otherwise the lines
+    of a full-page OCR pass are parsed (pass layout from ocr_layout to
+    reuse one). Returns {"nutrients", "basis", "serving_size", "rows", "method"}.
+    """
+    frame = as_frame(image)
+    rows = locate_table_rows(frame)
+    if rows:
+        # One scale for every row, from the typical single-line row height
+        median_height = sorted(box[3] for box in rows)[len(rows) // 2]
+        factor = min(3.0, max(1.0, TABLE_ROW_HEIGHT / median_height))
+        crops = [_row_crop(frame.gray, box, factor) for box in rows]
+        with tracing.span("ocr.table_rows", rows=len(crops)):
+            results = ocr_backend.map_to_data(crops)
+        lines = [line for data in results for line in _data_lines(data)]
+        method = "table"
+    else:
+        if layout is None:
+            layout = ocr_layout(frame)
+        lines = [line["text"] for line in layout["lines"]]
+        method = "layout"
+    facts = parse_nutrition_lines(lines)
+    facts.update(rows=lines, method=method)
+    return facts
+
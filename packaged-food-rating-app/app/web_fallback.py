@@ -1,16 +1,43 @@
 import os
 import requests
-from dotenv import load_dotenv
+from tracing import traced
 
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
-CX = os.getenv("GOOGLE_CX")
+# Override to point at a local stub search server for offline testing
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", 5))
 
-def google_search(query, num_results=2):
-    """Search Google Programmable Search Engine"""
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {"q": query, "key": API_KEY, "cx": CX, "num": num_results}
-    response = requests.get(url, params=params)
+# Worth retrying later: rate limited / quota exceeded, or a server-side failure
+RETRYABLE_STATUS = {403, 429, 500, 502, 503, 504}
+
+_env_loaded = False
+
+def _load_env():
+    """Read .env on first search instead of at import time"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def search_configured():
+    """True when there is an API key and engine id, or a non-default search URL"""
+    _load_env()
+    return bool(os.getenv("GOOGLE_API_KEY") and os.getenv("GOOGLE_CX")) or \
+        GOOGLE_SEARCH_URL != "https://www.googleapis.com/customsearch/v1"
+
+@traced("web.google_search")
+def google_search(query, num_results=2, timeout=SEARCH_TIMEOUT):
+    """Search Google Programmable Search Engine.
+
+    Returns the result items ([] when there are none or the request is
+    rejected). Raises requests.HTTPError for quota and server errors so
+    callers can retry later instead of treating them as "no results".
+    """
+    _load_env()
+    params = {"q": query, "key": os.getenv("GOOGLE_API_KEY"), "cx": os.getenv("GOOGLE_CX"), "num": num_results}
+    response = requests.get(GOOGLE_SEARCH_URL, params=params, timeout=timeout)
+    if response.status_code in RETRYABLE_STATUS:
+        response.raise_for_status()
     if response.status_code == 200:
         return response.json().get("items", [])
     return []
@@ -0,0 +1,96 @@
+"""Compare the precompiled additive index with the original linear scan.
+
+Usage: python benchmarks/bench_additive_index.py [num_products]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+import scoring
+from scoring import FSSAI_DB, normalize_ingredient, parse_ingredients, search_additives
+
+COMMON_INGREDIENTS = [
+    "sugar", "salt", "palm oil", "wheat flour", "milk solids", "cocoa butter",
+    "emulsifier (E471)", "soy lecithin", "preservative E211", "acidity regulator (330)",
+    "raising agent (500(ii))", "flavour enhancer E621", "maltodextrin", "water",
+    "edible vegetable oil", "iodised salt", "spices & condiments", "citric acid",
+]
+
+
+def search_additives_legacy(ingredients_text, fssai_db):
+    """Original implementation: re-normalize the DB and scan it per ingredient"""
+    matches = []
+    ingredients = parse_ingredients(ingredients_text)
+
+    fssai_normalized = {}
+    for entry in fssai_db:
+        if isinstance(entry, dict):
+            name = normalize_ingredient(entry.get('name', ''))
+            code = entry.get('code', '').lower()
+            if name:
+                fssai_normalized[name] = entry
+            if code:
+                fssai_normalized[code] = entry
+        elif isinstance(entry, str):
+            name = normalize_ingredient(entry)
+            if name:
+                fssai_normalized[name] = {'name': entry}
+
+    for ingredient in ingredients:
+        if ingredient in fssai_normalized:
+            matches.append(fssai_normalized[ingredient])
+            continue
+        for db_name, entry in fssai_normalized.items():
+            if ingredient in db_name or db_name in ingredient:
+                matches.append(entry)
+                break
+
+    return matches
+
+
+def db_names(fssai_db):
+    names = []
+    for entry in fssai_db:
+        if isinstance(entry, dict) and entry.get('name'):
+            names.append(entry['name'])
+        elif isinstance(entry, str):
+            names.append(entry)
+    return names
+
+
+def make_products(n, seed=7):
+    rng = random.Random(seed)
+    vocabulary = COMMON_INGREDIENTS + db_names(FSSAI_DB)
+    return [", ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 25))) for _ in range(n)]
+
+
+def timed(fn, products):
+    start = time.perf_counter()
+    results = [fn(text, FSSAI_DB) for text in products]
+    return results, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    products = make_products(n)
+
+    start = time.perf_counter()
+    scoring.get_additive_index(FSSAI_DB)
+    build = time.perf_counter() - start
+
+    legacy, legacy_time = timed(search_additives_legacy, products)
+    indexed, indexed_time = timed(search_additives, products)
+
+    mismatches = sum(1 for a, b in zip(legacy, indexed) if a != b)
+    print(f"DB entries: {len(FSSAI_DB)}, index keys: {len(scoring.get_additive_index(FSSAI_DB))}")
+    print(f"Products: {n}, index build: {build * 1000:.1f} ms")
+    print(f"Legacy:  {legacy_time * 1000:.1f} ms ({n / legacy_time:,.0f} products/s)")
+    print(f"Indexed: {indexed_time * 1000:.1f} ms ({n / indexed_time:,.0f} products/s)")
+    print(f"Speedup: {legacy_time / indexed_time:.1f}x, mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Barcode lookups and their cache against a local stub OpenFoodFacts server.
+
+Starts an OFF lookalike on localhost (fixed latency), points OFF_API_URL
+and a temporary BARCODE_CACHE_PATH at it and checks:
+
+- a known barcode is fetched once, then served from the cache;
+- an unknown barcode is cached negatively (one request);
+- a server error is not cached (asked again on the next lookup);
+- after a restart (fresh in-process cache) hits come from the SQLite file;
+- resolve_product caches a miss only when every source answered "not
+  found", and a failing source (500 from OFF, 429 from the fallbacks)
+  counts towards its circuit breaker instead.
+
+Reports network vs cached lookup latency and exits 1 on a failed check.
+
+Usage: python benchmarks/bench_barcode_lookup.py [lookup_ms]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+KNOWN = "8901234567890"
+UNKNOWN = "5012345678900"
+FAILING = "4000000000000"
+
+_tmp = tempfile.mkdtemp()
+os.environ["BARCODE_CACHE_PATH"] = os.path.join(_tmp, "lookups.sqlite")
+os.environ["OFF_MIRROR_PATH"] = os.path.join(_tmp, "no_mirror.sqlite")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+
+class StubOpenFoodFacts(BaseHTTPRequestHandler):
+    delay = 0.05
+    requests = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/upcitemdb"):
+            # Fallback sources: rate limited for the failing barcode, else not found
+            self.send_response(429 if parse_qs(url.query)["upc"][0] == FAILING else 404)
+            self.end_headers()
+            return
+        if url.path.startswith("/barcodespider"):
+            self.send_response(429 if url.path.endswith(FAILING) else 404)
+            self.end_headers()
+            return
+        barcode = url.path.rsplit("/", 1)[-1].removesuffix(".json")
+        with StubOpenFoodFacts.lock:
+            StubOpenFoodFacts.requests[barcode] = StubOpenFoodFacts.requests.get(barcode, 0) + 1
+        time.sleep(self.delay)
+        if barcode == FAILING:
+            self.send_response(500)
+            self.end_headers()
+            return
+        if barcode == KNOWN:
+            body = {"status": 1, "product": {"product_name": "Stub biscuits",
+                                             "ingredients_text": "Wheat flour, sugar, palm oil, salt",
+                                             "nutriments": {"sugars_100g": 24.0}}}
+        else:
+            body = {"status": 0}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    StubOpenFoodFacts.delay = (float(sys.argv[1]) if len(sys.argv) > 1 else 50) / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenFoodFacts)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OFF_API_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["UPCITEMDB_API_URL"] = f"http://127.0.0.1:{server.server_port}/upcitemdb"
+    os.environ["BARCODESPIDER_API_URL"] = f"http://127.0.0.1:{server.server_port}/barcodespider"
+
+    import input_handler
+    from lookup_cache import MISS
+    from input_handler import lookup_product_by_barcode
+    requests = StubOpenFoodFacts.requests
+    failures = []
+
+    def check(name, ok):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    product, network_ms = timed(lookup_product_by_barcode, KNOWN)
+    check("known barcode found", bool(product) and product["product_name"] == "Stub biscuits")
+    cached_ms = [timed(lookup_product_by_barcode, KNOWN)[1] for _ in range(100)]
+    check("known barcode fetched once", requests.get(KNOWN) == 1)
+
+    for _ in range(3):
+        lookup_product_by_barcode(UNKNOWN)
+    check("unknown barcode cached negatively", requests.get(UNKNOWN) == 1)
+
+    for _ in range(2):
+        lookup_product_by_barcode(FAILING)
+    check("server error not cached", requests.get(FAILING) == 2)
+
+    # Restart: drop the in-process cache, keep the SQLite file
+    input_handler._barcode_cache = None
+    product, disk_ms = timed(lookup_product_by_barcode, KNOWN)
+    check("served from the cache file after a restart", bool(product) and requests.get(KNOWN) == 1)
+
+    import product_resolver
+    resolved = product_resolver.get_resolved_cache()
+    check("resolver caches a miss every source confirmed",
+          product_resolver.resolve_product(UNKNOWN) is None and resolved.get(UNKNOWN) is None)
+    check("resolver does not cache a miss while sources fail",
+          product_resolver.resolve_product(FAILING) is None and resolved.get(FAILING) is MISS)
+    check("failing sources count towards their breakers",
+          all(source.breaker.failures == 1 for source in product_resolver.SOURCES))
+
+    print(f"Lookup latency: network {network_ms:.1f} ms, cached p50 {statistics.median(cached_ms):.3f} ms, "
+          f"cache file {disk_ms:.2f} ms (stub latency {StubOpenFoodFacts.delay * 1000:.0f} ms)")
+    print(f"Cache stats: {input_handler.get_barcode_cache().stats}")
+    server.shutdown()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Check evaluate_products against evaluate_product and time the nutrient part.
+
+Usage: python benchmarks/bench_batch_scoring.py [num_products]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+import pandas as pd
+from scoring import (
+    NUTRIENT_LIMITS, evaluate_product, evaluate_products, nutrient_rule_arrays, score_nutrient_matrix,
+)
+
+INGREDIENTS = [
+    "Sugar, wheat flour, palm oil, emulsifier (E471), salt",
+    "Water, sugar, acidity regulator (330), preservative (211), sucralose 400 mg/kg",
+    "Milk solids, cocoa butter, tartrazine (E102), salt",
+    "",
+]
+
+
+def make_products(n, seed=11):
+    rng = random.Random(seed)
+    products = []
+    for _ in range(n):
+        nutrients = {}
+        for key, rule in NUTRIENT_LIMITS.items():
+            if rng.random() < 0.7:
+                bound = rule.get("max", rule.get("min", 10))
+                value = round(rng.uniform(0, bound * 2), 2)
+                # OpenFoodFacts sometimes returns numbers as strings
+                nutrients[key] = str(value) if rng.random() < 0.1 else value
+        products.append({"nutrients": nutrients, "ingredients_text": rng.choice(INGREDIENTS)})
+    return products
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    products = make_products(n)
+
+    start = time.perf_counter()
+    single = [evaluate_product(p["nutrients"], p["ingredients_text"]) for p in products]
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = evaluate_products(products)
+    batch_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(single, batch) if a != b)
+
+    # Flat numeric columns, no ingredient text
+    rules = nutrient_rule_arrays()
+    frame = pd.DataFrame.from_records([p["nutrients"] for p in products], columns=rules["keys"])
+    frame = pd.concat([frame.apply(pd.to_numeric)] * max(1, 200000 // n), ignore_index=True)
+    start = time.perf_counter()
+    result = evaluate_products(frame)
+    frame_time = time.perf_counter() - start
+
+    # Nutrient checks alone, without building the message lists
+    matrix = frame.to_numpy(dtype=float)
+    start = time.perf_counter()
+    score_nutrient_matrix(matrix, rules)
+    nutrient_time = time.perf_counter() - start
+
+    print(f"Products: {n}")
+    print(f"evaluate_product:  {single_time * 1000:.1f} ms ({n / single_time:,.0f} products/s)")
+    print(f"evaluate_products: {batch_time * 1000:.1f} ms ({n / batch_time:,.0f} products/s)")
+    print(f"DataFrame batch: {len(result):,} rows in {frame_time * 1000:.1f} ms "
+          f"({len(result) / frame_time:,.0f} products/s)")
+    print(f"Nutrient checks: {len(matrix):,} rows in {nutrient_time * 1000:.1f} ms "
+          f"({len(matrix) / nutrient_time:,.0f} products/s)")
+    print(f"Mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
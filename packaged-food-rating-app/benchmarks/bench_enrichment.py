@@ -0,0 +1,135 @@
+"""Background ingredient enrichment against a local stub search server.
+
+Starts a Custom Search lookalike on localhost (fixed latency, every Nth
+request answered with 429), points GOOGLE_SEARCH_URL at it and scores a
+stream of products whose unknown ingredients repeat across products,
+submitting each product's `missing` list the way the app and pipeline do.
+Reports:
+
+- score-and-submit latency with enrichment off and on (it should not move);
+- searches sent vs unique unknown ingredients (deduplication);
+- the observed search rate vs the token-bucket limit;
+- searches made by a second process-like Enricher sharing the cache file
+  (should be 0: each ingredient is looked up once).
+
+Usage: python benchmarks/bench_enrichment.py [num_products] [search_ms]
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RATE = 20
+BURST = 5
+FAIL_EVERY = 7
+
+_tmp = tempfile.mkdtemp()
+os.environ["ENRICHMENT"] = "0"
+os.environ["ENRICHMENT_CACHE_PATH"] = os.path.join(_tmp, "enrichment.sqlite")
+os.environ["ENRICHMENT_BATCH_WAIT"] = "0.05"
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+
+class StubSearch(BaseHTTPRequestHandler):
+    delay = 0.05
+    requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubSearch.lock:
+            StubSearch.requests += 1
+            number = StubSearch.requests
+        time.sleep(self.delay)
+        if number % FAIL_EVERY == 0:
+            self.send_response(429)
+            self.end_headers()
+            return
+        query = parse_qs(urlparse(self.path).query)["q"][0]
+        body = json.dumps({"items": [{"title": f"About {query}", "link": "http://stub/" + query.replace(" ", "-"),
+                                      "snippet": "stub result"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_products(n, seed=3):
+    rng = random.Random(seed)
+    known = ["sugar", "salt", "wheat flour", "palm oil", "tartrazine (E102)", "citric acid"]
+    unknown = [f"{word} extract" for word in ("moringa", "amla", "brahmi", "tulsi", "ashwagandha", "shatavari",
+                                             "giloy", "neem", "arjuna", "triphala", "jatamansi", "shankhpushpi")]
+    return [", ".join(rng.sample(known, 3) + rng.sample(unknown, 2)) for _ in range(n)]
+
+
+def score_latencies(products, evaluate_product, submit):
+    latencies = []
+    for text in products:
+        start = time.perf_counter()
+        submit(evaluate_product({"sugars_100g": 12}, text)[3])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    StubSearch.delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSearch)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["GOOGLE_SEARCH_URL"] = f"http://127.0.0.1:{server.server_port}/customsearch/v1"
+
+    import enrichment
+    from scoring import evaluate_product
+    products = make_products(n)
+    unknown = {ing for ing in evaluate_product({}, ", ".join(products))[3]}
+    score_latencies(products[:50], evaluate_product, enrichment.submit)  # warm the memos and reference data
+
+    off = score_latencies(products, evaluate_product, enrichment.submit)
+    enricher = enrichment._default = enrichment.Enricher(rate=RATE, burst=BURST)
+    start = time.perf_counter()
+    on = score_latencies(products, evaluate_product, enrichment.submit)
+    # Failed (429) lookups are forgotten; a later request re-submits them
+    while not enricher.join(timeout=30) or enricher.stats["searches"] < len(unknown):
+        before = enricher.stats["searches"]
+        score_latencies(products[:200], evaluate_product, enrichment.submit)
+        enricher.join(timeout=30)
+        if enricher.stats["searches"] == before:
+            break
+    elapsed = time.perf_counter() - start
+
+    for name, samples in (("enrichment off", off), ("enrichment on", on)):
+        q = statistics.quantiles(samples, n=100)
+        print(f"{name:15s} score + submit p50 {q[49]:.3f} ms  p99 {q[98]:.3f} ms")
+    stats = enricher.stats
+    requests_sent = stats["searches"] + stats["errors"]
+    print(f"Unknown ingredients {len(unknown)}, submitted {stats['submitted']}, duplicates skipped "
+          f"{stats['duplicates']}, searches {stats['searches']} (+{stats['errors']} rate-limited, retried)")
+    print(f"Search rate {requests_sent / elapsed:.1f}/s (limit {RATE}/s, burst {BURST}), "
+          f"stub saw {StubSearch.requests} requests")
+    resolved = enricher.lookup_many(sorted(unknown))
+    print(f"Resolved {len(resolved)}/{len(unknown)} from the cache")
+
+    # A second process sharing the cache file finds everything already resolved
+    StubSearch.requests = 0
+    other = enrichment.Enricher(cache=None, rate=RATE, burst=BURST)
+    other.submit(sorted(unknown))
+    other.join(timeout=30)
+    print(f"Second enricher on the same cache: {StubSearch.requests} searches, {other.stats['cached']} cached")
+    enricher.close()
+    other.close()
+    server.shutdown()
+    return 0 if len(resolved) == len(unknown) and StubSearch.requests == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Compare decoding a large upload per vision function against one shared Frame.
+
+The legacy path mirrors what the app did before Frame: PIL opens the
+upload, decode_barcode converts it to grayscale and resizes it, and OCR
+preprocessing converts it to BGR again and resizes that. The Frame path
+decodes once (at reduced resolution) and derives the same inputs from its
+cached grayscale pyramid. Each path runs in a fresh process so peak RSS is
+comparable.
+
+Usage: python benchmarks/bench_frame_decode.py [width] [runs]
+"""
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+import cv2
+import numpy as np
+
+
+def make_upload(width, seed=3):
+    """A photo-like JPEG (gradients, text, sensor noise) of roughly upload size"""
+    rng = np.random.default_rng(seed)
+    height = width * 3 // 4
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.dstack([(x * 0.6 + y * 0.4), (255 - x) * 0.5 + y * 0.3, (x + y) * 0.4]).astype(np.float32)
+    image += rng.normal(0, 12, image.shape).astype(np.float32)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    for row in range(20):
+        cv2.putText(image, "INGREDIENTS: SUGAR, SALT, E102, MILK SOLIDS", (100, 200 + row * height // 22),
+                    cv2.FONT_HERSHEY_SIMPLEX, width / 1500, (20, 20, 20), max(1, width // 800))
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+
+
+def legacy(data):
+    import imutils
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    # decode_barcode: grayscale, 500 px localization copy, 1000 px fallback
+    gray = np.array(image.convert("L"))
+    height, width = gray.shape
+    cv2.resize(gray, (500, int(height * 500 / width)), interpolation=cv2.INTER_AREA)
+    cv2.resize(gray, (1000, int(height * 1000 / width)))
+    # ocr_layout: BGR conversion, 1000 px resize, grayscale
+    bgr = cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    return cv2.cvtColor(imutils.resize(bgr, width=1000), cv2.COLOR_BGR2GRAY)
+
+
+def shared_frame(data):
+    from frame import Frame
+    frame = Frame.from_bytes(data)
+    frame.gray_at_width(500)
+    frame.gray_at_width(1000)
+    return frame.gray_at_width(1000)
+
+
+def run_child(path_name, upload_path, runs):
+    with open(upload_path, "rb") as f:
+        data = f.read()
+    func = legacy if path_name == "legacy" else shared_frame
+    # Warm up imports so only decoding is measured
+    import imutils  # noqa: F401
+    from PIL import Image  # noqa: F401
+    import frame  # noqa: F401
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(data)
+        times.append(time.perf_counter() - start)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{min(times) * 1000:.1f} {(after - before) / 1024:.1f}")
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        pass
+    # Build the upload in a child too: Linux carries the parent's peak RSS
+    # over into forked children, which would hide their own peaks
+    subprocess.run([sys.executable, __file__, "--make", str(width), f.name], check=True)
+    with open(f.name, "rb") as upload:
+        data = upload.read()
+    print(f"Upload: {width}x{width * 3 // 4} JPEG, {len(data) / 1e6:.1f} MB")
+
+    try:
+        results = {}
+        for name in ("legacy", "frame"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", name, f.name, str(runs)],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            results[name] = (float(output[0]), float(output[1]))
+            print(f"{name:7s} best {results[name][0]:7.1f} ms, peak RSS growth {results[name][1]:6.1f} MB")
+        print(f"Speedup: {results['legacy'][0] / results['frame'][0]:.1f}x")
+
+        # The shared pyramid level must match the legacy OCR input closely
+        diff = np.abs(legacy(data).astype(int) - shared_frame(data).astype(int)).mean()
+        print(f"Mean abs difference of the 1000 px OCR input: {diff:.2f} grey levels")
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "--make":
+        with open(sys.argv[3], "wb") as f:
+            f.write(make_upload(int(sys.argv[2])))
+    else:
+        main()
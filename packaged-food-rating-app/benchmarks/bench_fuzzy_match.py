@@ -0,0 +1,91 @@
+"""Accuracy and latency of OCR-tolerant additive matching.
+
+Generates OCR-style misreads of every additive name in the DB (digit/letter
+confusions, a split word, a dropped or swapped character) and checks the
+fuzzy lookup recovers the right entry, then counts false positives on
+common non-additive ingredients. Lookups are timed uncached.
+
+Usage: python benchmarks/bench_fuzzy_match.py [threshold]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+from additive_index import squash
+from scoring import FSSAI_DB, FUZZY_MATCH_THRESHOLD, get_additive_index
+
+COMMON = [
+    "sugar", "salt", "water", "wheat flour", "palm oil", "milk solids", "cocoa butter", "cocoa solids",
+    "edible vegetable oil", "iodised salt", "glucose syrup", "invert syrup", "corn starch", "rice flour",
+    "whey powder", "maltodextrin", "soy lecithin", "spices and condiments", "raising agent", "lactose",
+    "skimmed milk powder", "hydrogenated vegetable fat", "dextrose", "onion powder", "garlic powder",
+]
+CONFUSIONS = {"i": "1", "l": "1", "o": "0", "s": "5"}
+
+
+def misreads(name, rng):
+    """A few OCR-style corruptions of name"""
+    variants = []
+    confusable = [i for i, c in enumerate(name) if c in CONFUSIONS and 0 < i < len(name) - 1]
+    if confusable:
+        i = rng.choice(confusable)
+        variants.append(name[:i] + CONFUSIONS[name[i]] + name[i + 1:])
+    if len(name) > 6:
+        i = rng.randrange(3, len(name) - 2)
+        variants.append(name[:i] + " " + name[i:])
+        i = rng.randrange(1, len(name) - 1)
+        variants.append(name[:i] + name[i + 1:])
+        i = rng.randrange(1, len(name) - 2)
+        variants.append(name[:i] + name[i + 1] + name[i] + name[i + 2:])
+    return [v for v in variants if v != name]
+
+
+def same_additive(a, b):
+    a, b = squash(a), squash(b)
+    return a.startswith(b) or b.startswith(a)
+
+
+def main():
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else FUZZY_MATCH_THRESHOLD
+    index = get_additive_index(FSSAI_DB)
+    rng = random.Random(7)
+    cases = []
+    for key, entry in zip(index.keys, index.values):
+        if key in index.codes:
+            continue
+        for variant in misreads(key, rng):
+            # Only corruptions that the exact/substring path misses
+            if index.lookup(variant) is None:
+                cases.append((variant, entry))
+
+    correct = wrong = 0
+    start = time.perf_counter()
+    for variant, expected in cases:
+        entry, _ = index._lookup_scored(variant, threshold)
+        # The DB lists some additives under several spellings ("Sulphur di-oxide",
+        # "Butylated hydroxyanisole BHA")
+        if entry is not None and same_additive(entry.get("name", ""), expected.get("name", "")):
+            correct += 1
+        elif entry is not None:
+            wrong += 1
+    per_token = (time.perf_counter() - start) / max(len(cases), 1) * 1e6
+
+    false_positives = []
+    for ingredient in COMMON:
+        if index.lookup(ingredient) is None:
+            entry, confidence = index._lookup_scored(ingredient, threshold)
+            if entry is not None:
+                false_positives.append(f"{ingredient} -> {entry.get('name')} ({confidence:.2f})")
+
+    print(f"Threshold {threshold}, {len(index.keys)} index keys")
+    print(f"Misreads: {len(cases)}, recovered {correct} ({correct / len(cases):.1%}), "
+          f"wrong entry {wrong}, {per_token:.0f} us/token uncached")
+    print(f"False positives on {len(COMMON)} common ingredients: {len(false_positives)}")
+    for line in false_positives:
+        print("  " + line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure cold import time of the app modules and fail if startup regresses.
+
+Each module is imported in a fresh interpreter under -X importtime; the
+median cumulative time must stay within its budget, and none of the heavy
+vision/data-frame packages may be loaded as a side effect.
+
+Usage: python benchmarks/bench_import_time.py [runs] [budget_scale]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+# Median cumulative import time budgets in milliseconds
+BUDGETS_MS = {
+    "scoring": 60,
+    "analysis_cache": 40,
+    "input_handler": 250,
+    "product_resolver": 250,
+    "pipeline": 300,
+}
+
+# Loaded only on the image and batch-scoring paths
+HEAVY_MODULES = ["cv2", "numpy", "pandas", "PIL", "pytesseract", "pyzbar", "imutils", "tesserocr", "dotenv"]
+
+# First scoring call loads the reference data and builds the additive index
+FIRST_USE = (
+    "import time; t = time.perf_counter(); import scoring; "
+    "scoring.evaluate_product({'sugars_100g': 30}, 'Sugar, salt, tartrazine (E102)'); "
+    "print((time.perf_counter() - t) * 1000)"
+)
+FIRST_USE_BUDGET_MS = 150
+
+
+def import_profile(module):
+    """Return (cumulative ms, set of modules imported) for a cold import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    cumulative, imported = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        name = name.strip()
+        imported.add(name.split(".")[0])
+        if name == module:
+            cumulative = int(cumulative_us) / 1000
+    return cumulative, imported
+
+
+def first_use_ms():
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_USE], cwd=APP_DIR, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    failures = []
+
+    for module, budget in BUDGETS_MS.items():
+        times, heavy = [], set()
+        for _ in range(runs):
+            ms, imported = import_profile(module)
+            times.append(ms)
+            heavy |= imported.intersection(HEAVY_MODULES)
+        median = statistics.median(times)
+        limit = budget * scale
+        status = "ok" if median <= limit and not heavy else "FAIL"
+        print(f"{module:18s} {median:8.1f} ms (budget {limit:.0f} ms) {status}"
+              + (f"  heavy imports: {', '.join(sorted(heavy))}" if heavy else ""))
+        if status != "ok":
+            failures.append(module)
+
+    median = statistics.median(first_use_ms() for _ in range(runs))
+    limit = FIRST_USE_BUDGET_MS * scale
+    status = "ok" if median <= limit else "FAIL"
+    print(f"{'first score':18s} {median:8.1f} ms (budget {limit:.0f} ms) {status}")
+    if status != "ok":
+        failures.append("first score")
+
+    if failures:
+        print(f"Import-time regression: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
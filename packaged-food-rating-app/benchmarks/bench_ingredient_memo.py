@@ -0,0 +1,74 @@
+"""Batch re-score throughput with and without the per-token ingredient memo.
+
+Builds a catalog whose ingredient lists are unique per product but drawn
+from a shared vocabulary, as in real catalogs, then scores it twice (a
+cold pass and a re-score) in child processes with INGREDIENT_MEMO_SIZE=0
+and the default. Checks the results are identical.
+
+Usage: python benchmarks/bench_ingredient_memo.py [num_products]
+"""
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+VOCABULARY = [
+    "sugar", "salt", "wheat flour", "palm oil", "emulsifier (E471)", "emulsifier (soy lecithin)",
+    "acidity regulator (330)", "preservative (211)", "milk solids", "cocoa solids", "invert syrup",
+    "raising agent (503)", "tartrazine (E102)", "edible vegetable oil", "spices and condiments",
+    "flavour enhancer (E621)", "water", "glucose syrup", "stabilizer (E414)", "citric acid",
+    "sucralose 400 mg/kg", "colour (E150d)", "maltodextrin", "iodised salt", "corn starch",
+    "sodium benzoate (150 mg/kg)", "natural flavouring", "whey powder", "rice flour", "guar gum",
+]
+
+
+def make_catalog(n, seed=5):
+    rng = random.Random(seed)
+    return [", ".join(rng.sample(VOCABULARY, rng.randint(4, 12))) for _ in range(n)]
+
+
+def child(n):
+    from scoring import evaluate_products, ingredient_memo_stats
+    products = [{"nutrients": {"sugars_100g": 20}, "ingredients_text": text} for text in make_catalog(n)]
+    evaluate_products(products[:1])  # load reference data outside the timing
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        results = evaluate_products(products)
+        timings.append(time.perf_counter() - start)
+    digest = hashlib.sha256(json.dumps(results).encode()).hexdigest()
+    print(json.dumps({"cold": timings[0], "rescore": timings[1], "digest": digest,
+                      "stats": ingredient_memo_stats()}))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    runs = {}
+    for label, size in (("no memo", "0"), ("memo", os.getenv("INGREDIENT_MEMO_SIZE", "65536"))):
+        env = dict(os.environ, INGREDIENT_MEMO_SIZE=size)
+        out = subprocess.run([sys.executable, __file__, "--child", str(n)], env=env,
+                             capture_output=True, text=True, check=True).stdout
+        runs[label] = json.loads(out)
+        run = runs[label]
+        print(f"{label:8s} cold {n / run['cold']:>9,.0f} products/s   re-score {n / run['rescore']:>9,.0f} products/s")
+
+    base, memo = runs["no memo"], runs["memo"]
+    print(f"Re-score speedup: {base['rescore'] / memo['rescore']:.1f}x")
+    for name, stats in memo["stats"].items():
+        print(f"  {name:10s} hit rate {stats['hit_rate']:.3f} ({stats['size']} entries)")
+    if base["digest"] != memo["digest"]:
+        print("Results differ with the memo enabled")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        child(int(sys.argv[2]))
+    else:
+        sys.exit(main())
@@ -0,0 +1,95 @@
+"""Regression benchmark for quantity extraction on long, noisy OCR label text.
+
+The legacy path ran one unescaped ``name.*?number unit`` search per matched
+additive over the whole text, which backtracks quadratically on long lines.
+The tokenizer makes a single pass, so time per KB should stay flat.
+Parity cases check which additive each declared quantity is attributed to.
+
+Usage: python benchmarks/bench_ingredient_tokenizer.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+from scoring import FSSAI_DB, label_quantities, search_additives_scored
+
+NOISE = ["lng", "redients", "|", "~", "0.5g", "12", "kg", "mg", "%o", "net wt", "rn", "l1", "--", "&"]
+WORDS = ["sugar", "salt", "sucralose", "citric acid", "palm oil", "tartrazine", "sorbitol", "guar gum"]
+
+# (label, {additive name: attributed mg/kg}); a quantity only goes to an
+# additive its owner text names, never to a loose substring hit
+PARITY_CASES = [
+    # "salt" substring-matches "... and its salts" but is not that additive
+    ("Wheat flour, salt (2%), sugar", {}),
+    ("Sucralose 400 mg/kg, citric acid", {"Sucralose": 400.0}),
+    ("Sugar, tartrazine (E102) 200 mg/kg", {"Tartrazine": 200.0}),
+    ("Water, E102 0.01%, salt (1%)", {"Tartrazine": 100.0}),
+    ("Dried apricots, sulphur dioxide 2000 mg/kg", {"Sulphur dioxide": 2000.0}),
+    ("tartraz1ne 500 mg/kg, sugar", {"Tartrazine": 500.0}),
+]
+
+
+def noisy_label(size, seed=3):
+    """One long OCR line (no newlines): many additive names, units only early on"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        part = rng.choice(WORDS) if rng.random() < 0.4 else rng.choice(NOISE)
+        if length < 500 and rng.random() < 0.2:
+            part += f" {rng.randint(1, 999)} mg/kg"
+        parts.append(part)
+        length += len(part) + 2
+    return ", ".join(parts)
+
+
+def legacy_quantities(hits, text):
+    quantities = []
+    for _, match, _ in hits:
+        name = match.get('name', 'Unknown additive')
+        qty_match = re.search(rf"{re.escape(name)}.*?(\d+(\.\d+)?)\s*(mg/kg|g/kg|%)", text, re.I)
+        quantities.append(qty_match.group(1) if qty_match else None)
+    return quantities
+
+
+def tokenized_quantities(hits, text):
+    quantities = label_quantities(text, hits, FSSAI_DB)
+    return [quantities.get(id(match)) for _, match, _ in hits]
+
+
+def check_parity():
+    failures = 0
+    for text, expected in PARITY_CASES:
+        hits = search_additives_scored(text, FSSAI_DB)
+        quantities = label_quantities(text, hits, FSSAI_DB)
+        actual = {entry["name"]: quantities[id(entry)] for _, entry, _ in hits if id(entry) in quantities}
+        if actual != expected:
+            failures += 1
+            print(f"MISMATCH {text!r}: expected {expected}, got {actual}")
+    print(f"Parity cases: {len(PARITY_CASES)}, mismatches: {failures}")
+    return failures
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'size':>8} {'matches':>8} {'legacy ms':>10} {'legacy ms/KB':>13} {'tokenizer ms':>13} {'tokenizer ms/KB':>16}")
+    for size in (5000, 10000, 20000):
+        text = noisy_label(size)
+        matches = search_additives_scored(text, FSSAI_DB, threshold=2)
+        kb = len(text) / 1024
+        legacy = timed(legacy_quantities, matches, text) * 1000
+        tokenized = timed(tokenized_quantities, matches, text) * 1000
+        print(f"{len(text):>8} {len(matches):>8} {legacy:>10.1f} {legacy / kb:>13.2f} {tokenized:>13.1f} {tokenized / kb:>16.3f}")
+    return 1 if check_parity() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
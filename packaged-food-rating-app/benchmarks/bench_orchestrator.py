@@ -0,0 +1,71 @@
+"""End-to-end image latency, sequential vs speculative OCR.
+
+Barcode decoding is real (synthetic EAN-13 labels); OCR and the product
+lookup are replaced by sleeps of fixed length so the run is offline and
+does not need Tesseract. Three cases: the barcode resolves, the barcode
+is unknown (OCR fallback) and no barcode at all.
+
+Usage: python benchmarks/bench_orchestrator.py [ocr_ms] [lookup_ms] [runs]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+import cv2
+import numpy as np
+import orchestrator
+from synthetic_barcodes import ean13, place_on_label, render_ean13
+
+KNOWN = ean13("890123456789")
+UNKNOWN = ean13("501234567890")
+
+
+def main():
+    ocr_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 800
+    lookup_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 300
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    def fake_ocr(frame, cancelled=None):
+        if cancelled is not None and cancelled.is_set():
+            return None
+        time.sleep(ocr_ms / 1000)
+        return {"text": "Ingredients: sugar, salt", "ingredients": "sugar, salt",
+                "nutrition": {"nutrients": {"sugars_100g": 12.0}}}
+
+    def fake_resolve(barcode):
+        time.sleep(lookup_ms / 1000)
+        if barcode == KNOWN:
+            return {"product_name": "Known", "ingredients_text": "sugar, salt", "nutrients": {}}
+        return None
+
+    orchestrator.ocr_label = fake_ocr
+    orchestrator.resolve_product = fake_resolve
+
+    blank = np.full((900, 1200, 3), 225, np.uint8)
+    cases = {
+        "product found": place_on_label(render_ean13(KNOWN)),
+        "unknown barcode": place_on_label(render_ean13(UNKNOWN)),
+        "no barcode": blank,
+    }
+    print(f"Simulated OCR {ocr_ms:.0f} ms, lookup {lookup_ms:.0f} ms, median of {runs} runs")
+    for name, image in cases.items():
+        data = cv2.imencode(".jpg", image)[1].tobytes()
+        timings = {}
+        for label, speculative in (("sequential", False), ("speculative", True)):
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = orchestrator.analyze_image(data, speculative=speculative)
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[label] = statistics.median(samples)
+        source = "product" if result["product"] else "OCR" if result["ingredients"] else "none"
+        print(f"{name:16s} sequential {timings['sequential']:7.1f} ms   speculative {timings['speculative']:7.1f} ms"
+              f"   ({source})")
+    # Let abandoned speculative OCR finish before exiting
+    orchestrator._executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
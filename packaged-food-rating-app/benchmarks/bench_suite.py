@@ -0,0 +1,372 @@
+"""Offline performance and accuracy suite for the vision and scoring stages.
+
+Corpus (generated deterministically, no network):
+- synthetic EAN-13 barcodes on a label background across rotations, blur,
+  noise and scales, for decode_barcode;
+- rendered ingredient/nutrition labels (clean and degraded) with known
+  text and nutrients, plus the bundled nu-facts.jpg (transcribed) and
+  test_label.jpg (latency only), for extract_text_from_image,
+  detect_ingredients_section and extract_nutrition_facts;
+- label and sample products for evaluate_product.
+
+Reports latency percentiles, decode rate, character error rate (CER),
+nutrient accuracy and score agreement, saves the run as JSON and optionally compares it with a
+previous run, exiting non-zero on regressions.
+
+Usage:
+    python benchmarks/bench_suite.py [--full] [--repeat N] [--output run.json] [--compare base.json]
+    python benchmarks/bench_suite.py --compare-only base.json run.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.append(APP_DIR)
+import cv2
+import numpy as np
+from scoring import evaluate_product
+from synthetic_barcodes import degrade, ean13, place_on_label, render_ean13
+from synthetic_labels import LABELS, label_text, render_label
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+CODES = [ean13("890123456789"), ean13("501234567890")]
+GRID = {"rotation": [0, 10, 30], "blur": [0, 5], "noise": [0, 20], "scale": [1.0, 0.5]}
+FULL_GRID = {"rotation": [0, 5, 15, 30, 45], "blur": [0, 3, 5, 9], "noise": [0, 10, 25], "scale": [1.0, 0.6, 0.35]}
+
+NU_FACTS_TEXT = """Nutrition Facts
+Serving Size 212 g
+Amount Per Serving
+Calories 257 Calories from Fat 84
+% Daily Value*
+Total Fat 9.4g 14%
+Saturated Fat 1.1g 6%
+Cholesterol 0mg 0%
+Sodium 41mg 2%
+Potassium 400mg 11%
+Total Carbohydrates 39.8g 13%
+Dietary Fiber 10.0g 40%
+Sugars 2.1g
+Protein 8.0g
+Vitamin A 10% Vitamin C 16%
+Calcium 3% Iron 14%
+Nutrition Grade A
+* Based on a 2000 calorie diet"""
+
+# nu-facts.jpg per 212 g serving, as per-100 g values in NUTRIENT_LIMITS' units
+NU_FACTS_NUTRIENTS = {
+    key: round(value * 100 / 212, 4) for key, value in {
+        "energy-kcal_100g": 257, "fat_100g": 9.4, "saturated-fat_100g": 1.1, "sodium_100g": 41,
+        "carbohydrates_100g": 39.8, "fiber_100g": 10.0, "sugars_100g": 2.1, "proteins_100g": 8.0,
+    }.items()
+}
+
+SAMPLE_PRODUCTS = [
+    ({"sugars_100g": 30, "salt_100g": 0.2}, "Sugar, wheat flour, palm oil, emulsifier (E471), salt"),
+    ({"fat_100g": 5, "proteins_100g": 8}, "Water, sugar, acidity regulator (330), preservative (211), sucralose 400 mg/kg"),
+    ({}, "Milk solids, cocoa butter, tartrazine (E102), salt"),
+    ({"energy-kcal_100g": 520, "fiber_100g": 4}, ""),
+]
+
+# Allowed drift before a comparison counts as a regression
+LATENCY_TOLERANCE = 1.25
+LATENCY_FLOOR_MS = 1.0
+RATE_TOLERANCE = 0.02
+CER_TOLERANCE = 0.02
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return None
+    values = np.percentile(samples_ms, [50, 90, 99])
+    return {"p50": round(float(values[0]), 3), "p90": round(float(values[1]), 3),
+            "p99": round(float(values[2]), 3), "n": len(samples_ms)}
+
+
+def normalize_text(text):
+    """Lowercase, keep letters/digits/% and collapse everything else to single spaces"""
+    return " ".join(re.sub(r"[^a-z0-9%.]+", " ", (text or "").lower()).split())
+
+
+def cer(reference, hypothesis):
+    """Character error rate: Levenshtein distance / reference length"""
+    ref, hyp = normalize_text(reference), normalize_text(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def barcode_corpus(grid):
+    items = []
+    for code_index, code in enumerate(CODES):
+        label = place_on_label(render_ean13(code), at=(0.3 + 0.4 * code_index, 0.6), seed=code_index)
+        for rotation in grid["rotation"]:
+            for blur in grid["blur"]:
+                for noise in grid["noise"]:
+                    for scale in grid["scale"]:
+                        conditions = {"rotation": rotation, "blur": blur, "noise": noise, "scale": scale}
+                        image = degrade(label, angle=rotation, blur=blur, noise=noise, scale=scale,
+                                        seed=len(items))
+                        items.append((code, conditions, image))
+    return items
+
+
+def label_corpus():
+    """(id, BGR image, full reference text or None, ingredients reference or None, nutrients)"""
+    items = []
+    for label in LABELS:
+        clean = render_label(label)
+        items.append((label["name"], clean, label_text(label), label["ingredients"], label["nutrients"]))
+        degraded = degrade(clean, angle=2, blur=3, noise=8, seed=1)
+        items.append((label["name"] + "_degraded", degraded, label_text(label), label["ingredients"],
+                      label["nutrients"]))
+    items.append(("nu-facts", cv2.imread(os.path.join(APP_DIR, "nu-facts.jpg")), NU_FACTS_TEXT, None,
+                  NU_FACTS_NUTRIENTS))
+    items.append(("test_label", cv2.imread(os.path.join(APP_DIR, "test_label.jpg")), None, None, None))
+    return items
+
+
+def bench_decode_barcode(vision, grid):
+    latencies, hits, items = [], 0, []
+    by_condition = {}
+    for code, conditions, image in barcode_corpus(grid):
+        results, ms = timed(vision.decode_barcode, image)
+        ok = any(result["data"] == code for result in results)
+        latencies.append(ms)
+        hits += ok
+        items.append({"code": code, **conditions, "ok": ok, "ms": round(ms, 3)})
+        for key, value in conditions.items():
+            bucket = by_condition.setdefault(key, {}).setdefault(str(value), [0, 0])
+            bucket[0] += ok
+            bucket[1] += 1
+    return {
+        "latency_ms": percentiles(latencies),
+        "decode_rate": round(hits / len(items), 4),
+        "by_condition": {key: {value: round(ok / n, 4) for value, (ok, n) in values.items()}
+                         for key, values in by_condition.items()},
+        "items": items,
+    }
+
+
+def bench_extract_text(vision, labels, repeat):
+    latencies, errors, items = [], [], []
+    for name, image, reference, _, _ in labels:
+        for _ in range(repeat):
+            text, ms = timed(vision.extract_text_from_image, image)
+            latencies.append(ms)
+        item = {"id": name, "ms": round(ms, 3)}
+        if reference is not None:
+            item["cer"] = round(cer(reference, text), 4)
+            errors.append(item["cer"])
+        items.append(item)
+    return {"latency_ms": percentiles(latencies), "cer": round(float(np.mean(errors)), 4), "items": items}
+
+
+def bench_detect_ingredients(vision, labels, repeat):
+    latencies, errors, items = [], [], []
+    detected = agree = scored = 0
+    for name, image, _, reference, nutrients in labels:
+        if reference is None:
+            continue
+        for _ in range(repeat):
+            text, ms = timed(vision.detect_ingredients_section, image)
+            latencies.append(ms)
+        item = {"id": name, "ms": round(ms, 3), "detected": bool(text), "cer": round(cer(reference, text), 4)}
+        detected += bool(text)
+        errors.append(item["cer"])
+        # Does scoring the OCR'd list give the same result as the true list?
+        expected = evaluate_product(nutrients, reference)[0]
+        actual = evaluate_product(nutrients, text or "")[0]
+        item.update({"expected_score": expected, "score": actual})
+        agree += expected == actual
+        scored += 1
+        items.append(item)
+    return {
+        "latency_ms": percentiles(latencies),
+        "detect_rate": round(detected / scored, 4),
+        "cer": round(float(np.mean(errors)), 4),
+        "score_agreement": round(agree / scored, 4),
+        "items": items,
+    }
+
+
+def bench_nutrition_facts(vision, labels, repeat):
+    """Share of expected nutrients read within 2% (nutrients missed count as wrong)"""
+    latencies, items = [], []
+    correct = expected_total = 0
+    for name, image, _, _, expected in labels:
+        if not expected:
+            continue
+        for _ in range(repeat):
+            facts, ms = timed(vision.extract_nutrition_facts, image)
+            latencies.append(ms)
+        found = facts["nutrients"]
+        ok = sum(1 for key, value in expected.items()
+                 if key in found and abs(found[key] - value) <= max(0.02 * abs(value), 0.01))
+        correct += ok
+        expected_total += len(expected)
+        items.append({"id": name, "ms": round(ms, 3), "method": facts["method"], "correct": ok,
+                      "expected": len(expected), "nutrients": found})
+    return {"latency_ms": percentiles(latencies), "nutrient_accuracy": round(correct / expected_total, 4),
+            "items": items}
+
+
+def bench_evaluate_product(repeat):
+    products = [(f"sample_{i}", nutrients, text) for i, (nutrients, text) in enumerate(SAMPLE_PRODUCTS)]
+    products += [(label["name"], label["nutrients"], label["ingredients"]) for label in LABELS]
+    latencies, scores = [], {}
+    for name, nutrients, text in products:
+        for _ in range(max(repeat, 1) * 50):
+            result, ms = timed(evaluate_product, nutrients, text)
+            latencies.append(ms)
+        scores[name] = list(result)
+    return {"latency_ms": percentiles(latencies), "scores": scores}
+
+
+def run_suite(full=False, repeat=3):
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "full": full,
+            "repeat": repeat,
+        }
+    }
+    try:
+        import vision_handler as vision
+    except ImportError as e:
+        vision = None
+        skipped = {"skipped": f"vision stack unavailable: {e}"}
+
+    if vision is not None:
+        grid = FULL_GRID if full else GRID
+        results["decode_barcode"] = bench_decode_barcode(vision, grid)
+        labels = label_corpus()
+        for key, bench in (("extract_text_from_image", bench_extract_text),
+                           ("detect_ingredients_section", bench_detect_ingredients),
+                           ("extract_nutrition_facts", bench_nutrition_facts)):
+            try:
+                results[key] = bench(vision, labels, repeat)
+            except Exception as e:
+                # Typically Tesseract missing; report instead of failing the whole run
+                results[key] = {"skipped": f"{type(e).__name__}: {e}"}
+    else:
+        for key in ("decode_barcode", "extract_text_from_image", "detect_ingredients_section",
+                    "extract_nutrition_facts"):
+            results[key] = skipped
+    results["evaluate_product"] = bench_evaluate_product(repeat)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base, new):
+    """Return a list of regression messages (empty if new is no worse than base)"""
+    regressions = []
+    for section in ("decode_barcode", "extract_text_from_image", "detect_ingredients_section",
+                    "extract_nutrition_facts", "evaluate_product"):
+        old, cur = base.get(section, {}), new.get(section, {})
+        if "skipped" in old or "skipped" in cur or not old or not cur:
+            continue
+        if old.get("latency_ms") and cur.get("latency_ms"):
+            before, after = old["latency_ms"]["p50"], cur["latency_ms"]["p50"]
+            if after > before * LATENCY_TOLERANCE and after - before > LATENCY_FLOOR_MS:
+                regressions.append(f"{section}: p50 latency {before:.2f} -> {after:.2f} ms")
+        for metric in ("decode_rate", "detect_rate", "nutrient_accuracy", "score_agreement"):
+            if metric in old and metric in cur and cur[metric] < old[metric] - RATE_TOLERANCE:
+                regressions.append(f"{section}: {metric} {old[metric]:.3f} -> {cur[metric]:.3f}")
+        if "cer" in old and "cer" in cur and cur["cer"] > old["cer"] + CER_TOLERANCE:
+            regressions.append(f"{section}: CER {old['cer']:.3f} -> {cur['cer']:.3f}")
+        if "scores" in old and "scores" in cur:
+            changed = sorted(k for k in old["scores"] if k in cur["scores"] and old["scores"][k] != cur["scores"][k])
+            if changed:
+                regressions.append(f"{section}: scores changed for {', '.join(changed)}")
+    return regressions
+
+
+def summarize(results):
+    for section, data in results.items():
+        if section == "meta":
+            continue
+        if "skipped" in data:
+            print(f"{section:28s} skipped ({data['skipped']})")
+            continue
+        latency = data["latency_ms"]
+        parts = [f"p50 {latency['p50']:.2f} ms", f"p90 {latency['p90']:.2f} ms", f"p99 {latency['p99']:.2f} ms"]
+        for metric in ("decode_rate", "detect_rate", "nutrient_accuracy", "cer", "score_agreement"):
+            if metric in data:
+                parts.append(f"{metric} {data[metric]:.3f}")
+        print(f"{section:28s} " + ", ".join(parts))
+        if section == "decode_barcode":
+            for key, values in data["by_condition"].items():
+                print(f"{'':30s}{key}: " + ", ".join(f"{v}={rate:.2f}" for v, rate in values.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="use the full barcode degradation grid")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions per OCR image")
+    parser.add_argument("--output", help="where to save the run (default benchmarks/results/<time>.json, git-ignored)")
+    parser.add_argument("--compare", help="previous run to compare against")
+    parser.add_argument("--compare-only", nargs=2, metavar=("BASE", "NEW"), help="compare two saved runs")
+    args = parser.parse_args()
+
+    if args.compare_only:
+        with open(args.compare_only[0]) as f:
+            base = json.load(f)
+        with open(args.compare_only[1]) as f:
+            results = json.load(f)
+    else:
+        results = run_suite(full=args.full, repeat=args.repeat)
+        output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(results, f, indent=1)
+        summarize(results)
+        print(f"Saved {output}")
+        base = None
+        if args.compare:
+            with open(args.compare) as f:
+                base = json.load(f)
+
+    if base is not None:
+        if base["meta"].get("full") != results["meta"].get("full"):
+            print("Warning: the runs use different barcode grids (--full)")
+        regressions = compare(base, results)
+        for message in regressions:
+            print("REGRESSION", message)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {base['meta'].get('commit') or base['meta']['timestamp']}")
+
+
+if __name__ == "__main__":
+    main()
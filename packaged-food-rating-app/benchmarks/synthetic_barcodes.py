@@ -0,0 +1,78 @@
+"""Render synthetic EAN-13 barcodes for offline benchmarks"""
+import cv2
+import numpy as np
+
+# Digit encodings for the left (odd "L" / even "G" parity) and right halves
+L_CODES = ["0001101", "0011001", "0010011", "0111101", "0100011",
+           "0110001", "0101111", "0111011", "0110111", "0001011"]
+G_CODES = ["0100111", "0110011", "0011011", "0100001", "0011101",
+           "0111001", "0000101", "0010001", "0001001", "0010111"]
+R_CODES = ["1110010", "1100110", "1101100", "1000010", "1011100",
+           "1001110", "1010000", "1000100", "1001000", "1110100"]
+# Parity pattern of the left half, chosen by the first digit
+PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG",
+          "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+
+def ean13_check_digit(digits12):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits12))
+    return str((10 - total % 10) % 10)
+
+
+def ean13(digits12):
+    """Complete a 12-digit prefix with its check digit"""
+    return digits12 + ean13_check_digit(digits12)
+
+
+def ean13_modules(code):
+    """Bar pattern of a 13-digit EAN as a string of 0/1 modules"""
+    first, left, right = int(code[0]), code[1:7], code[7:]
+    bits = "101"
+    for parity, digit in zip(PARITY[first], left):
+        bits += (L_CODES if parity == "L" else G_CODES)[int(digit)]
+    bits += "01010"
+    for digit in right:
+        bits += R_CODES[int(digit)]
+    return bits + "101"
+
+
+def render_ean13(code, module_px=3, height=120, quiet_modules=11):
+    """Black-on-white grayscale image of the barcode with quiet zones"""
+    modules = ean13_modules(code)
+    width = (len(modules) + 2 * quiet_modules) * module_px
+    image = np.full((height + 2 * quiet_modules * module_px // 2, width), 255, np.uint8)
+    top = quiet_modules * module_px // 2
+    for i, bit in enumerate(modules):
+        if bit == "1":
+            x = (quiet_modules + i) * module_px
+            image[top:top + height, x:x + module_px] = 0
+    return image
+
+
+def place_on_label(barcode, size=(900, 1200), at=(0.5, 0.5), seed=0):
+    """Paste a barcode onto a noisy, off-white label background (BGR)"""
+    rng = np.random.default_rng(seed)
+    height, width = size
+    label = np.clip(rng.normal(225, 12, (height, width)), 0, 255).astype(np.uint8)
+    h, w = barcode.shape
+    y = int((height - h) * at[1])
+    x = int((width - w) * at[0])
+    label[y:y + h, x:x + w] = barcode
+    return cv2.cvtColor(label, cv2.COLOR_GRAY2BGR)
+
+
+def degrade(image, angle=0.0, blur=0, noise=0.0, scale=1.0, seed=0):
+    """Rotate (degrees), Gaussian-blur (kernel px), add noise (sigma) and rescale"""
+    rng = np.random.default_rng(seed)
+    if angle:
+        h, w = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        image = cv2.warpAffine(image, matrix, (w, h), borderValue=(230, 230, 230))
+    if blur:
+        k = blur | 1
+        image = cv2.GaussianBlur(image, (k, k), 0)
+    if noise:
+        image = np.clip(image + rng.normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
@@ -0,0 +1,77 @@
+"""Render synthetic packaging labels with known text for OCR benchmarks"""
+import textwrap
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Each label: title, ingredient list, nutrients per 100 g and trailing sections.
+# The rendered text is the ground truth for OCR and ingredient detection.
+LABELS = [
+    {
+        "name": "orange_drink",
+        "title": "ORANGE FLAVOURED DRINK",
+        "ingredients": "Water, sugar, acidity regulator (330), preservative (211), "
+                       "colour (E110), stabilizer (E414), flavouring",
+        "nutrients": {"energy-kcal_100g": 48, "sugars_100g": 11.5, "fat_100g": 0, "salt_100g": 0.02},
+        "footer": ["Storage: Keep in a cool and dry place.", "Best before 9 months from manufacture."],
+    },
+    {
+        "name": "cream_biscuits",
+        "title": "CHOCOLATE CREAM BISCUITS",
+        "ingredients": "Wheat flour, sugar, palm oil, cocoa solids, invert syrup, "
+                       "emulsifier (E471), raising agent (503), salt, tartrazine (E102)",
+        "nutrients": {"energy-kcal_100g": 486, "sugars_100g": 34, "fat_100g": 21, "saturated-fat_100g": 10,
+                      "salt_100g": 0.6},
+        "footer": ["Allergen: Contains wheat and milk.", "Manufactured by Example Foods Ltd."],
+    },
+    {
+        "name": "masala_chips",
+        "title": "MASALA POTATO CHIPS",
+        "ingredients": "Potato, edible vegetable oil, spices and condiments, salt, "
+                       "flavour enhancer (E621), sucralose 400 mg/kg",
+        "nutrients": {"energy-kcal_100g": 545, "sugars_100g": 2.1, "fat_100g": 34, "salt_100g": 2.4},
+        "footer": ["Net weight 52 g", "Marketed by Example Snacks Pvt Ltd."],
+    },
+]
+
+FONT_CANDIDATES = ["DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"]
+
+
+def _font(size):
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def label_lines(label, wrap=42):
+    """Text lines of a label as printed, paragraphs separated by blank lines"""
+    lines = [label["title"], ""]
+    lines += textwrap.wrap("Ingredients: " + label["ingredients"] + ".", wrap) + [""]
+    lines.append("Nutrition Information (per 100 g)")
+    for key, value in label["nutrients"].items():
+        name = key.replace("_100g", "").replace("-", " ").capitalize()
+        lines.append(f"{name} {value}")
+    lines.append("")
+    for paragraph in label["footer"]:
+        lines += textwrap.wrap(paragraph, wrap) + [""]
+    return lines[:-1]
+
+
+def label_text(label):
+    return "\n".join(label_lines(label))
+
+
+def render_label(label, width=900, font_size=28, margin=40):
+    """Black text on a white card, as a BGR array"""
+    lines = label_lines(label)
+    font = _font(font_size)
+    line_height = int(font_size * 1.45)
+    height = margin * 2 + line_height * len(lines)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * line_height), line, fill=0, font=font)
+    return cv2.cvtColor(np.array(image), cv2.COLOR_GRAY2BGR)
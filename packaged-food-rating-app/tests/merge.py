@@ -1,36 +1,273 @@
 import json
+import re
+import sqlite3
+import sys
+from pathlib import Path
 
-json_files = [
-    "db_part1.json",
-    "db_part2.json",
-    "db_part3.json",
-    "db_part4.json",
-    "db_part5.json",
-    "db_part6.json"
-]
-
-merged = []
-
-for file in json_files:
-    with open(file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        if isinstance(data, dict):
-            data = list(data.values())
-        elif isinstance(data, str):
-            data = [{"text": data}]
-        elif isinstance(data, list):
-            new_data = []
-            for entry in data:
-                if isinstance(entry, dict):
-                    new_data.append(entry)
+# Sections of the regulations that list food additives and their limits. The
+# food_colours section holds colour specifications, read by collect_codes only.
+ADDITIVE_SECTIONS = {
+    "chapter_3_substances_added_to_food",
+    "appendix_a",
+    "appendix_a_list_of_food_additives",
+}
+
+# E/INS numbers by additive: {code: [canonical name, other names in the regulations]}
+INS_NUMBERS_PATH = Path(__file__).with_name("ins_numbers.json")
+
+# Keys that hold plain foods, food categories or flavour types rather than additives
+SKIP_KEYS = {"class_i", "types", "permitted_foods", "product_columns"}
+
+LIMIT_RE = re.compile(
+    r"(\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?\s*(ppm|mg\s*/\s*kg|gm?\s*/\s*kg|%|percent)?",
+    re.I,
+)
+NAMED_LIMIT_RE = re.compile(r"([A-Za-z][^(),/]*?)\s*\(([^)]*\d[^)]*)\)")
+E_CODE_RE = re.compile(r"\bE[\s.\-]*(\d{3}[a-z]?)\b", re.I)
+TO_MG_PER_KG = {"ppm": 1, "mg/kg": 1, "g/kg": 1000, "gm/kg": 1000, "%": 10000, "percent": 10000}
+
+
+def parse_limit(value, default_unit="ppm"):
+    """Convert a limit like '350 ppm maximum' or '10g/kg' to mg/kg.
+
+    Returns (mg_per_kg, permitted). GMP limits have no number; '-' means
+    the additive is not permitted in that category.
+    """
+    if isinstance(value, bool):
+        return None, value
+    if isinstance(value, (int, float)):
+        return float(value) * TO_MG_PER_KG[default_unit], True
+    text = str(value).strip()
+    if text in ("", "-"):
+        return None, False
+    if "gmp" in text.lower().replace(".", ""):
+        return None, True
+    match = LIMIT_RE.search(text)
+    if not match:
+        return None, True
+    upper = float(match.group(2) or match.group(1))
+    unit = re.sub(r"\s+", "", (match.group(3) or default_unit).lower())
+    return upper * TO_MG_PER_KG[unit], True
+
+
+def humanize(key):
+    return key.replace("_", " ").strip()
+
+
+def iter_additive_rows(node, path=()):
+    """Walk the nested regulations and yield flat additive rows"""
+    parent = path[-1] if path else ""
+    additive_class = humanize(" ".join(
+        p for p in path[-2:] if p != "additives" and not p.startswith("table_") and not p.endswith("_table")
+    ))
+
+    if isinstance(node, list):
+        for item in node:
+            if isinstance(item, str):
+                # Bare lists of permitted additives carry no per-category limit
+                if parent in SKIP_KEYS or "prohibited" in parent:
+                    continue
+                yield {"name": item, "category": "general", "class": humanize(parent), "max_permitted": None}
+            else:
+                yield from iter_additive_rows(item, path)
+        return
+
+    if not isinstance(node, dict):
+        return
+
+    name = node.get("name") or node.get("substances")
+    if isinstance(name, str):
+        if isinstance(node.get("products"), dict):
+            limits = node["products"].items()
+        elif "food" in node:
+            limits = [(node["food"], node.get("maximum_level_ppm"))]
+        else:
+            limits = [(k, v) for k, v in node.items() if k != "name" and isinstance(v, (str, int, float))]
+        for category, value in limits:
+            max_permitted, permitted = parse_limit(value)
+            if permitted:
+                yield {"name": name, "category": humanize(category), "class": additive_class,
+                       "max_permitted": max_permitted}
+        return
+
+    for key, value in node.items():
+        if key in SKIP_KEYS:
+            continue
+        if key.endswith("_max_ppm") and isinstance(value, dict):
+            # e.g. "saccharin_sodium_max_ppm": {"sweets": 500, ...}
+            for category, limit in value.items():
+                unit = "percent" if category.endswith("_percent") else "ppm"
+                category = category[: -len("_percent")] if unit == "percent" else category
+                max_permitted, permitted = parse_limit(limit, unit)
+                if permitted:
+                    yield {"name": humanize(key[: -len("_max_ppm")]).capitalize(), "category": humanize(category),
+                           "class": humanize(parent), "max_permitted": max_permitted}
+        elif key.startswith("permitted_in_") and isinstance(value, dict):
+            # e.g. "permitted_in_edible_oils_and_fats": {"ascorbyl_palmitate": "0.02 percent"}
+            for additive, limit in value.items():
+                max_permitted, permitted = parse_limit(limit)
+                if permitted:
+                    yield {"name": humanize(additive).capitalize(), "category": humanize(key[len("permitted_in_"):]),
+                           "class": humanize(parent), "max_permitted": max_permitted}
+        elif isinstance(value, str) and path and NAMED_LIMIT_RE.search(value):
+            # e.g. "paneer": "Nisin (12.5 ppm maximum)"
+            for additive, limit in NAMED_LIMIT_RE.findall(value):
+                additive = re.sub(r"^(or|and)\s+", "", additive.strip(), flags=re.I)
+                max_permitted, permitted = parse_limit(limit)
+                if additive and permitted:
+                    yield {"name": additive, "category": humanize(key), "class": humanize(parent),
+                           "max_permitted": max_permitted}
+        else:
+            yield from iter_additive_rows(value, path + (key,))
+
+
+def collect_codes(node, codes):
+    """Collect E/INS numbers from the additive specifications, keyed by name"""
+    if isinstance(node, dict):
+        for key, spec in node.items():
+            if isinstance(spec, dict):
+                code = None
+                if spec.get("ins_number"):
+                    code = f"E{spec['ins_number']}"
                 else:
-                    new_data.append({"text": str(entry)})
-            data = new_data
-        merged.extend(data)
+                    for text in [spec.get("code_number", "")] + list(spec.get("synonyms", [])):
+                        found = E_CODE_RE.search(str(text))
+                        if found:
+                            code = f"E{found.group(1).lower()}"
+                            break
+                if code:
+                    codes[humanize(key).lower()] = code
+                    if spec.get("common_name"):
+                        codes[spec["common_name"].lower()] = code
+                collect_codes(spec, codes)
+    elif isinstance(node, list):
+        for item in node:
+            collect_codes(item, codes)
+
+
+def load_ins_numbers(path=INS_NUMBERS_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def assign_codes(rows, spec_codes, ins_numbers):
+    """Set each row's E/INS code; returns the rows plus one copy per additive a row covers.
+
+    A row under an additive's canonical name gets its code. A row under another
+    spelling or a combined name ("benzoic acid, sodium and potassium benzoate")
+    is copied to the canonical name of each additive it names, so every code
+    resolves to a single entry carrying all of its limits. Codes from the
+    specifications fill in additives the mapping does not list.
+    """
+    canonical, covers = {}, {}
+    for code, names in ins_numbers.items():
+        canonical[names[0].lower()] = code
+        for name in names[1:]:
+            covers.setdefault(name.lower(), []).append(code)
+    for name, code in spec_codes.items():
+        if name not in canonical and name not in covers and code not in ins_numbers:
+            canonical[name] = code
+
+    coded = []
+    for row in rows:
+        key = row["name"].lower()
+        row["code"] = canonical.get(key)
+        coded.append(row)
+        for code in covers.get(key, []):
+            coded.append({**row, "name": ins_numbers[code][0], "code": code})
+    return coded
+
+
+def compile_additive_table(entries, output_path, ins_numbers=None):
+    """Flatten additive limits into one SQLite row per additive x food category"""
+    ins_numbers = load_ins_numbers() if ins_numbers is None else ins_numbers
+    rows, codes = [], {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        collect_codes(entry, codes)
+        for key, section in entry.items():
+            if key in ADDITIVE_SECTIONS:
+                rows.extend(iter_additive_rows(section, (key,)))
+
+    # Specified additives with no category rows are still permitted additives
+    named = {row["name"].lower() for row in rows}
+    for name, code in codes.items():
+        if name not in named:
+            rows.append({"name": name.title(), "category": "general", "class": "specification",
+                         "max_permitted": None})
+            named.add(name)
+    rows = assign_codes(rows, codes, ins_numbers)
+
+    output_path = Path(output_path)
+    if output_path.exists():
+        output_path.unlink()
+    conn = sqlite3.connect(output_path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE additives (code TEXT, name TEXT NOT NULL, category TEXT, "
+            "class TEXT, max_permitted REAL)"
+        )
+        conn.executemany(
+            "INSERT INTO additives VALUES (:code, :name, :category, :class, :max_permitted)", rows
+        )
+        conn.execute("CREATE INDEX additives_name ON additives (name)")
+        conn.execute("CREATE INDEX additives_code ON additives (code)")
+    conn.execute("VACUUM")
+    conn.close()
+    return len(rows)
+
+
+def main(argv):
+    if len(argv) > 1 and argv[1] == "--compile-only":
+        # Rebuild the additive table from an already merged regulations file
+        source = argv[2] if len(argv) > 2 else "fssai_regulations.json"
+        target = argv[3] if len(argv) > 3 else "fssai_additives.sqlite"
+        with open(source, "r", encoding="utf-8") as f:
+            rows = compile_additive_table(json.load(f), target)
+        print(f"✅ Compiled {rows} additive rows into {target}")
+        return
+
+    json_files = [
+        "db_part1.json",
+        "db_part2.json",
+        "db_part3.json",
+        "db_part4.json",
+        "db_part5.json",
+        "db_part6.json"
+    ]
+
+    merged = []
+
+    for file in json_files:
+        with open(file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            if isinstance(data, dict):
+                data = list(data.values())
+            elif isinstance(data, str):
+                data = [{"text": data}]
+            elif isinstance(data, list):
+                new_data = []
+                for entry in data:
+                    if isinstance(entry, dict):
+                        new_data.append(entry)
+                    else:
+                        new_data.append({"text": str(entry)})
+                data = new_data
+            merged.extend(data)
+
+    # ✅ No deduplication → keep all rows
+    output_path = "fssai_regulations.json"
+    with open(output_path, "w", encoding="utf-8") as out:
+        json.dump(merged, out, indent=2, ensure_ascii=False)
+
+    print(f"✅ Merged {len(merged)} entries into {output_path}")
+
+    # Compile the flat additive table that scoring.py loads at runtime
+    table_path = "fssai_additives.sqlite"
+    rows = compile_additive_table(merged, table_path)
+    print(f"✅ Compiled {rows} additive rows into {table_path}")
 
-# ✅ No deduplication → keep all rows
-output_path = "fssai_regulations.json"
-with open(output_path, "w", encoding="utf-8") as out:
-    json.dump(merged, out, indent=2, ensure_ascii=False)
 
-print(f"✅ Merged {len(merged)} entries into {output_path}")
+if __name__ == "__main__":
+    main(sys.argv)
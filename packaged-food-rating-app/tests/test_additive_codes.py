@@ -0,0 +1,65 @@
+"""E/INS codes on labels resolve through the compiled additive table."""
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).parent
+REFERENCES_DIR = TESTS_DIR.parent / "app" / "references"
+sys.path[:0] = [str(TESTS_DIR), str(TESTS_DIR.parent / "app")]
+
+from merge import compile_additive_table  # noqa: E402
+from additive_index import AdditiveIndex  # noqa: E402
+from scoring import evaluate_product, load_additive_table, normalize_ingredient  # noqa: E402
+
+COMMON_CODES = {
+    "E102": "Tartrazine",
+    "E110": "Sunset yellow FCF",
+    "E202": "Potassium sorbate",
+    "E211": "Sodium benzoate",
+    "E220": "Sulphur dioxide",
+    "E330": "Citric acid",
+    "E471": "Mono and di glycerides of fatty acids",
+    "E950": "Acesulfame potassium",
+}
+
+
+def compile_table(path):
+    with open(REFERENCES_DIR / "fssai_regulations.json", "r", encoding="utf-8") as f:
+        compile_additive_table(json.load(f), path)
+    return path
+
+
+def table_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute("SELECT code, name, category, class, max_permitted FROM additives"),
+                      key=repr)
+    finally:
+        conn.close()
+
+
+def test_common_codes_resolve(tmp_path):
+    index = AdditiveIndex(load_additive_table(compile_table(tmp_path / "additives.sqlite")), normalize_ingredient)
+    for code, name in COMMON_CODES.items():
+        entry = index.lookup(code.lower())
+        assert entry is not None, code
+        assert entry["name"].lower() == name.lower(), code
+
+
+def test_combined_entries_keep_their_limits(tmp_path):
+    # "Benzoic acid, sodium and potassium benzoate" rows apply to sodium benzoate too
+    entries = {entry["name"].lower(): entry for entry in load_additive_table(compile_table(tmp_path / "a.sqlite"))}
+    assert entries["sodium benzoate"]["code"] == "E211"
+    assert "preservative" in entries["sodium benzoate"]["class"]
+    assert entries["sodium benzoate"]["limits"]
+
+
+def test_code_only_label_is_scored():
+    score, pros, cons, missing = evaluate_product({}, "Water, E211, E330, E471")
+    assert "Contains preservative: Sodium benzoate" in cons
+    assert missing == ["water"]
+
+
+def test_shipped_table_is_up_to_date(tmp_path):
+    assert table_rows(REFERENCES_DIR / "fssai_additives.sqlite") == table_rows(compile_table(tmp_path / "a.sqlite"))